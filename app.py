@@ -1,21 +1,119 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, abort, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, session, abort, jsonify, send_from_directory, after_this_request, g, has_request_context, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate, upgrade as upgrade_database
+from sqlalchemy import DDL, and_, bindparam, case, delete, event, func, literal, select, text, update, or_
+from sqlalchemy.orm import joinedload
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
+from werkzeug.exceptions import HTTPException
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
-from datetime import datetime
+import re
+import math
+import mimetypes
+from datetime import datetime, timedelta
 import secrets
+import click
 from flask_paginate import Pagination, get_page_parameter
-import re
 import uuid
+import atexit
+from collections import Counter, namedtuple
+import hashlib
+import json
+import time
+from cache import LRUCache, make_cache
+from events import EventBroker
+from jobs import JobRunner, TaskRegistry, retry_delay
+from likes import LikeBuffer
+from metrics import Metrics, RequestStats
+from synthetic import SyntheticData, batched
+from ratelimit import RateLimiter, make_bucket_store
+from registry import VersionedRegistry
+from stats import bucket_start, series, sparkline
+from markup import render_commands
+from media import process_avatar, process_voice_note, thumbnail_filename
+from pagination import CursorPagination, PagePagination, decode_cursor, encode_cursor, keyset_condition
+from search import SEARCH_SCHEMA, REBUILD_SEARCH, MATCH_SQL, match_expression
 
-# Initialize Flask app
+# Initialize Flask app (call create_app() to apply config and set up extensions)
 app = Flask(__name__)
-app.config['SECRET_KEY'] = secrets.token_hex(16)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///menfess.db'
+app.config['SECRET_KEY'] = None  # MENFESS_SECRET_KEY, or generated once into instance/secret_key
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(app.instance_path, 'menfess.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Database connection configurations
+app.config['SQLITE_BUSY_TIMEOUT'] = 5000  # Milliseconds a writer waits for the database lock
+app.config['DB_POOL_SIZE'] = 5
+app.config['DB_MAX_OVERFLOW'] = 10
+app.config['DB_POOL_TIMEOUT'] = 30
+
+# Pagination configurations
+app.config['CURSOR_PAGINATION'] = False  # Use newer/older cursor links instead of numbered pages
+app.config['PAGINATION_COUNT_TTL'] = 30  # Seconds a list total is reused by the page widget
+app.config['RENDER_CACHE_SIZE'] = 2048  # Rendered menfess bodies kept in memory
+
+# Trending feed: every HOT_DECAY seconds of age weighs as much as 10x the points
+app.config['HOT_DECAY'] = 45000
+app.config['HOT_COMMENT_WEIGHT'] = 2  # Points per comment (a like is one point)
+
+# Request metrics (per process): latency, SQL queries and template time per endpoint
+app.config['METRICS_ENABLED'] = True
+app.config['METRICS_QUERY_LOG_THRESHOLD'] = None  # Log requests running more SQL queries than this
+app.config['METRICS_TOKEN'] = None  # Bearer token for scraping /metrics without an admin session
+
+# Write-behind likes: toggles are buffered in memory and stored in batches
+app.config['LIKE_WRITE_BEHIND'] = False
+app.config['LIKE_FLUSH_INTERVAL'] = 0.25  # Seconds between batched writes
+
+# Rate limiting: token buckets per user and per client IP for each write endpoint.
+# 'memory' limits each worker on its own; sqlite:///<path> shares the buckets
+# through a separate small database file.
+app.config['RATE_LIMIT_ENABLED'] = True
+app.config['RATE_LIMIT_STORAGE'] = 'memory'
+app.config['RATE_LIMITS'] = {
+    'post_menfess': '5/minute',
+    'add_comment': '20/minute',
+    'like_menfess': '60/minute',
+    'report_menfess': '10/hour',
+    'register': '5/hour',
+    'login': '10/minute',
+    'search': '30/minute',
+}
+app.config['PROXY_COUNT'] = 0  # Reverse proxies in front of the app, so client IPs come from X-Forwarded-For
+
+# Moderation
+app.config['MODERATION_BATCH_SIZE'] = 500  # Most menfesses one bulk action may touch
+app.config['MODERATION_QUEUE_PAGE'] = 50  # Pending menfesses per JSON page
+
+# Report triage
+app.config['REPORTS_PER_PAGE'] = 10  # Reported menfesses per page
+app.config['REPORT_SAMPLE_REASONS'] = 3  # Latest reasons shown per menfess
+
+# Live updates (Server-Sent Events). Every open page holds a /stream connection, so
+# only turn this on when serving from an async worker (see README)
+app.config['LIVE_UPDATES'] = False
+app.config['STREAM_HEARTBEAT'] = 15  # Seconds between keep-alive comments on an idle stream
+app.config['STREAM_QUEUE_SIZE'] = 100  # Undelivered events per client before it is dropped
+
+# Search
+app.config['SEARCH_PER_PAGE'] = 10
+app.config['CATEGORY_CHECK_INTERVAL'] = 5  # Seconds between checks for category changes made by other workers
+app.config['COMMENTS_PER_PAGE'] = 50  # Comments per chunk of a thread (first page and infinite scroll)
+app.config['API_PAGE_SIZE'] = 20  # Default items per JSON API page (?limit=)
+app.config['API_MAX_PAGE_SIZE'] = 100
+app.config['SEARCH_COMMENT_WEIGHT'] = 0.5  # Relative weight of a comment hit against a menfess hit
+app.config['SEARCH_MIN_PREFIX'] = 3  # Shortest last word that also matches as a prefix
+app.config['SEARCH_MAX_CANDIDATES'] = 500  # Best hits taken from each search index (bounds common terms)
+
+# Page cache for anonymous feed pages ('memory' or a redis:// URL shared by all workers)
+app.config['PAGE_CACHE_BACKEND'] = 'memory'
+app.config['PAGE_CACHE_SIZE'] = 512
+app.config['PAGE_CACHE_TTL'] = 60
+
+# Default admin account created by `flask init-db`
+app.config['ADMIN_PASSWORD'] = 'admin123'
+
 # File upload configurations
 app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/uploads')
 app.config['PROFILE_PICS_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'profile_pics')
@@ -24,16 +122,66 @@ app.config['ALLOWED_IMAGE_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif'}
 app.config['ALLOWED_AUDIO_EXTENSIONS'] = {'mp3', 'wav', 'ogg', 'webm'}
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
+# Media processing configurations (uploads are staged, then processed by a background job)
+app.config['MEDIA_STAGING_FOLDER'] = os.path.join(app.instance_path, 'media_staging')
+app.config['AVATAR_SIZES'] = [40, 80, 150, 300]  # Square thumbnail sizes in pixels
+app.config['AVATAR_MAX_SIZE'] = 1024  # Larger originals are downscaled
+app.config['VOICE_NOTE_BITRATE'] = '48k'
+app.config['UPLOAD_GC_GRACE'] = 3600  # Seconds before an unreferenced file may be collected
+
+# Background jobs (stored in the job table, run by worker threads or `flask jobs work`)
+app.config['JOB_WORKERS'] = 2  # Worker threads per process; 0 leaves the jobs to `flask jobs work`
+app.config['JOB_POLL_INTERVAL'] = 1  # Seconds an idle worker waits before looking for due jobs again
+app.config['JOB_MAX_ATTEMPTS'] = 5
+app.config['JOB_RETRY_DELAY'] = 30  # Seconds before the first retry, doubled after every failure
+app.config['JOB_LEASE'] = 900  # Seconds before a job left running (e.g. by a killed worker) is taken over
+app.config['JOB_RETENTION_DAYS'] = 7  # Finished jobs are purged after this long
+app.config['JOB_SCHEDULE'] = {  # Periodic jobs: name -> seconds between runs
+    'gc-uploads': 3600,
+    'analyze': 24 * 3600,
+    'purge-jobs': 24 * 3600,
+}
+
+# Serving uploads
+app.config['UPLOAD_CACHE_MAX_AGE'] = 365 * 24 * 3600  # Content-addressed files never change
+app.config['LEGACY_UPLOAD_MAX_AGE'] = 3600  # Older uuid-named uploads and the default avatar
+app.config['USE_X_SENDFILE'] = False  # Let Apache/lighttpd send the file bytes
+app.config['UPLOAD_ACCEL_REDIRECT'] = None  # nginx internal location for UPLOAD_FOLDER, e.g. '/protected-uploads/'
+
 # Create upload directories if they don't exist
 os.makedirs(app.config['PROFILE_PICS_FOLDER'], exist_ok=True)
 os.makedirs(app.config['VOICE_NOTES_FOLDER'], exist_ok=True)
 
 # Initialize database
-db = SQLAlchemy(app)
+db = SQLAlchemy()
+
+def include_in_autogenerate(object, name, type_, reflected, compare_to):
+    # The FTS5 search tables (and their shadow tables) are created by hand, not from the models
+    return not (type_ == 'table' and '_fts' in name)
+
+migrate = Migrate(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations'),
+                  render_as_batch=True,  # Batch mode lets Alembic alter SQLite tables
+                  include_object=include_in_autogenerate)
+
+# In-process caches, sized from the config by create_app()
+count_cache = LRUCache(maxsize=256)  # List totals for the numbered pagination widget
+render_cache = LRUCache()  # Rendered menfess content, keyed by (id, content hash)
+page_cache = LRUCache()  # Rendered anonymous feed pages
+
+# Live update events for the /stream endpoint
+broker = EventBroker()
+
+# Request metrics for /admin/metrics and /metrics
+metrics = Metrics()
+
+# Background job functions by name (see the job runner below)
+job_tasks = TaskRegistry()
+
+# Write throttling, storage chosen by create_app()
+rate_limiter = RateLimiter()
 
 # Initialize login manager
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 # Define models
@@ -56,6 +204,23 @@ class Category(db.Model):
     description = db.Column(db.String(200))
     menfesses = db.relationship('Menfess', backref='category_rel', lazy=True)
 
+class VersionStamp(db.Model):
+    # Bumped by every write to a registry-cached table so all workers reload it
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+# Dashboard statistics, kept up to date by the write paths (rebuild-stats recomputes them)
+class StatCounter(db.Model):
+    name = db.Column(db.String(50), primary_key=True)  # users, pending_menfesses, reports
+    value = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+class StatRollup(db.Model):
+    metric = db.Column(db.String(50), primary_key=True)
+    period = db.Column(db.String(10), primary_key=True)  # hour or day
+    bucket = db.Column(db.DateTime, primary_key=True)  # Start of the hour/day (UTC)
+    count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total = db.Column(db.Float, nullable=False, default=0, server_default='0')  # Sum of the values, e.g. seconds
+
 class Menfess(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
@@ -68,18 +233,62 @@ class Menfess(db.Model):
     comments = db.relationship('Comment', backref='menfess', lazy=True, cascade="all, delete-orphan")
     voice_note = db.Column(db.String(200), nullable=True)
     display_name = db.Column(db.String(100), nullable=True)
+    approved_at = db.Column(db.DateTime, nullable=True)  # Same as created_at when auto-approved
+    # Denormalized counters, kept in step by the like/comment/report routes
+    like_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    report_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Trending rank, recomputed whenever the like/comment counters change
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    
+    # Indexes for the feed (latest and trending), category filter, moderation queue
+    # and "my menfesses" lists
+    __table_args__ = (
+        db.Index('ix_menfess_approved_created', 'is_approved', 'created_at'),
+        db.Index('ix_menfess_approved_category_created', 'is_approved', 'category_id', 'created_at'),
+        db.Index('ix_menfess_approved_hot', 'is_approved', 'hot_score'),
+        db.Index('ix_menfess_approved_category_hot', 'is_approved', 'category_id', 'hot_score'),
+        db.Index('ix_menfess_user_created', 'user_id', 'created_at'),
+    )
     
-    # Function to process commands in menfess content
+    # Category from the in-process registry (None if uncategorized)
+    @property
+    def category(self):
+        return category_registry.current().get(self.category_id)
+    
+    # Like count including toggles still waiting in the write-behind buffer
+    @property
+    def like_total(self):
+        return self.like_count + like_buffer.delta(self.id)
+    
+    # Function to process commands in menfess content (escaped HTML, cached per content)
     def process_commands(self):
-        # Process #bold# command
-        content = re.sub(r'#bold#(.*?)#bold#', r'<strong>\1</strong>', self.content)
-        # Process #italic# command
-        content = re.sub(r'#italic#(.*?)#italic#', r'<em>\1</em>', content)
-        # Process #color:color_name# command
-        content = re.sub(r'#color:(.*?)#(.*?)#color#', r'<span style="color:\1">\2</span>', content)
-        # Process #quote# command
-        content = re.sub(r'#quote#(.*?)#quote#', r'<blockquote>\1</blockquote>', content)
-        return content
+        return render_menfess(self.id, self.content)
+
+def render_menfess(menfess_id, content):
+    key = (menfess_id, hash(content))
+    rendered = render_cache.get(key)
+    if rendered is None:
+        rendered = render_commands(content)
+        render_cache.set(key, rendered)
+    return rendered
+
+HOT_EPOCH = datetime(2024, 1, 1)
+
+def hot_score(likes, comments, created_at):
+    # log10 of the points plus the age in HOT_DECAY units. Newer posts start higher,
+    # so scores never have to be decayed over time and only change with the counters.
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    points = likes + app.config['HOT_COMMENT_WEIGHT'] * comments
+    age = (created_at - HOT_EPOCH).total_seconds()
+    return round(math.log10(max(points, 1)) + age / app.config['HOT_DECAY'], 7)
+
+@event.listens_for(Menfess, 'before_insert')
+def set_initial_hot_score(mapper, connection, menfess):
+    if menfess.created_at is None:
+        menfess.created_at = datetime.utcnow()
+    menfess.hot_score = hot_score(menfess.like_count or 0, menfess.comment_count or 0, menfess.created_at)
 
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -87,6 +296,9 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     menfess_id = db.Column(db.Integer, db.ForeignKey('menfess.id'), nullable=False)
+    
+    # Index for loading a menfess' comments in order
+    __table_args__ = (db.Index('ix_comment_menfess_created', 'menfess_id', 'created_at'),)
 
 class Report(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -94,6 +306,28 @@ class Report(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     menfess_id = db.Column(db.Integer, db.ForeignKey('menfess.id'), nullable=False)
     reporter_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    
+    # Indexes for the report queue, and for grouping (and deleting) a menfess' reports
+    __table_args__ = (
+        db.Index('ix_report_created', 'created_at'),
+        db.Index('ix_report_menfess_created', 'menfess_id', 'created_at'),
+    )
+
+class MediaFile(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # avatar or voice
+    filename = db.Column(db.String(200), nullable=False)
+    status = db.Column(db.String(20), default='pending')  # pending, ready, failed
+    size = db.Column(db.Integer)  # Bytes after processing
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    duration = db.Column(db.Float)  # Seconds
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Users/menfesses using it
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (db.UniqueConstraint('kind', 'filename', name='unique_media_file'),)
 
 class Like(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -102,11 +336,38 @@ class Like(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Add unique constraint to prevent multiple likes from the same user
+    # (its index also serves lookups and counts by menfess_id)
     __table_args__ = (db.UniqueConstraint('menfess_id', 'user_id', name='unique_like'),)
 
+class Job(db.Model):
+    # Deferred or periodic work, run by the job workers (see enqueue)
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)  # Registered task name
+    args = db.Column(db.Text, nullable=False, default='{}')  # Keyword arguments as JSON
+    key = db.Column(db.String(200))  # Only one queued job per key
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = db.Column(db.DateTime)  # Lease of the worker running it
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        db.Index('ix_job_key_status', 'key', 'status'),
+    )
+
+# Full-text indexes for search, created with the comment table (migrations create them too)
+for statement in SEARCH_SCHEMA:
+    event.listen(Comment.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Loaded from the database on every request, so role, suspension and the
+    # profile columns routes write back are never stale across workers
+    return db.session.get(User, int(user_id))
 
 # Helper functions
 def allowed_image_file(filename):
@@ -117,42 +378,705 @@ def allowed_audio_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_AUDIO_EXTENSIONS']
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Media kinds and the upload folder each one is published to
+MEDIA_FOLDERS = {
+    'avatar': 'PROFILE_PICS_FOLDER',
+    'voice': 'VOICE_NOTES_FOLDER',
+}
+
+def stage_upload(file, kind):
+    # Stream the upload into the staging folder while hashing it; the blob is named
+    # after its SHA-256 so identical uploads share one file and one media record.
+    # The request only waits for the file to be written.
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    staging_folder = app.config['MEDIA_STAGING_FOLDER']
+    temp_path = os.path.join(staging_folder, f"upload-{uuid.uuid4().hex}.tmp")
+    digest = hashlib.sha256()
+    with open(temp_path, 'wb') as temp_file:
+        for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            temp_file.write(chunk)
+    filename = f"{digest.hexdigest()}.{ext}"
+    
+    # Take a reference in the request's transaction (atomic upsert on kind + filename).
+    # A record that isn't ready (e.g. it failed before) goes back to pending.
+    ready = MediaFile.status == 'ready'
+    status = db.session.execute(
+        sqlite_insert(MediaFile)
+        .values(kind=kind, filename=filename, ref_count=1, status='pending', created_at=datetime.utcnow())
+        .on_conflict_do_update(index_elements=['kind', 'filename'],
+                               set_={'ref_count': MediaFile.ref_count + 1,
+                                     'status': case((ready, 'ready'), else_='pending'),
+                                     'error': case((ready, MediaFile.error), else_=None)})
+        .returning(MediaFile.status)
+    ).scalar()
+    
+    staged_path = os.path.join(staging_folder, filename)
+    stored = os.path.exists(os.path.join(app.config[MEDIA_FOLDERS[kind]], filename))
+    if (status == 'ready' and stored) or os.path.exists(staged_path):
+        # Already stored (or being processed), keep the existing blob
+        os.remove(temp_path)
+    else:
+        os.replace(temp_path, staged_path)
+        # Processed by a job committed together with the media record
+        enqueue('process-media', key=f'media:{kind}:{filename}', kind=kind, filename=filename)
+    
+    return filename
+
+@job_tasks.task('process-media')
+def process_media(kind, filename):
+    # Runs as a background job (or from `flask process-media`)
+    with app.app_context():
+        # A record without references (e.g. the request failed) is collected by gc-uploads
+        media = MediaFile.query.filter_by(kind=kind, filename=filename).first() or \
+            MediaFile(kind=kind, filename=filename, ref_count=0)
+        source = os.path.join(app.config['MEDIA_STAGING_FOLDER'], filename)
+        dest_folder = app.config[MEDIA_FOLDERS[kind]]
+        try:
+            if kind == 'avatar':
+                metadata = process_avatar(source, dest_folder, filename,
+                                          app.config['AVATAR_SIZES'], app.config['AVATAR_MAX_SIZE'])
+            else:
+                metadata = process_voice_note(source, dest_folder, filename,
+                                              app.config['VOICE_NOTE_BITRATE'])
+            for key, value in metadata.items():
+                setattr(media, key, value)
+            media.status = 'ready'
+        except Exception as e:
+            app.logger.exception(f"Error processing {kind} {filename}")
+            # Never publish bytes that failed validation (e.g. HTML named .png)
+            discard_media(kind, filename)
+            media.status = 'failed'
+            media.error = str(e)
+            media.ref_count = 0
+        media.processed_at = datetime.utcnow()
+        db.session.add(media)
+        db.session.commit()
+
+def discard_media(kind, filename):
+    # Remove every copy of a rejected upload and detach it from the users or
+    # menfesses that referenced it
+    for path in media_paths(kind, filename):
+        if os.path.exists(path):
+            os.remove(path)
+    if kind == 'avatar':
+        db.session.execute(
+            update(User).where(User.profile_picture == filename).values(profile_picture='default.png')
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        db.session.execute(update(Menfess).where(Menfess.voice_note == filename).values(voice_note=None)
+                           .execution_options(synchronize_session=False))
+        invalidate_feed_cache()
+
+def release_media(kind, filename):
+    # Drop one reference to a stored upload; unreferenced files are removed later by
+    # the gc-uploads job instead of inside the request
+    release_media_many(kind, [filename])
+
+def release_media_many(kind, filenames):
+    # Drop one reference per occurrence of each filename in a single UPDATE
+    counts = Counter(filename for filename in filenames if filename)
+    if not counts:
+        return
+    db.session.execute(
+        update(MediaFile)
+        .where(MediaFile.kind == kind, MediaFile.filename.in_(counts))
+        .values(ref_count=MediaFile.ref_count - case(counts, value=MediaFile.filename, else_=0))
+        .execution_options(synchronize_session=False)
+    )
+    # Collect the files once they are past the grace period
+    enqueue('gc-uploads', delay=app.config['UPLOAD_GC_GRACE'], key='gc-uploads:released')
+
+def media_paths(kind, filename):
+    # Every file an upload may occupy: the original, its staged copy and thumbnails
+    folder = app.config[MEDIA_FOLDERS[kind]]
+    paths = [os.path.join(folder, filename),
+             os.path.join(app.config['MEDIA_STAGING_FOLDER'], filename)]
+    if kind == 'avatar':
+        paths += [os.path.join(folder, thumbnail_filename(filename, size)) for size in app.config['AVATAR_SIZES']]
+    return paths
+
 def save_profile_picture(file):
     if file and allowed_image_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Generate unique filename to prevent overwriting
-        unique_filename = f"{uuid.uuid4().hex}_{filename}"
-        file_path = os.path.join(app.config['PROFILE_PICS_FOLDER'], unique_filename)
-        file.save(file_path)
-        return unique_filename
+        return stage_upload(file, 'avatar')
     return None
 
 def save_voice_note(file):
     if file and allowed_audio_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Generate unique filename to prevent overwriting
-        unique_filename = f"{uuid.uuid4().hex}_{filename}"
-        file_path = os.path.join(app.config['VOICE_NOTES_FOLDER'], unique_filename)
-        file.save(file_path)
-        return unique_filename
+        return stage_upload(file, 'voice')
     return None
 
-# Create all tables
-with app.app_context():
-    db.create_all()
+def cached_count(key, query):
+    total = count_cache.get(key)
+    if total is None:
+        total = query.order_by(None).count()
+        count_cache.set(key, total)
+    return total
+
+def paginate(query, model, per_page, count_key, order_by=None):
+    # Cursor mode (opt-in via config or a before/after arg) skips both the
+    # count and the offset scan so deep pages cost the same as the first one.
+    # Other orderings than newest first (order_by) always use numbered pages.
+    if order_by is None and (app.config['CURSOR_PAGINATION'] or 'before' in request.args or 'after' in request.args):
+        pagination = CursorPagination(query, model, per_page)
+        return pagination.items, pagination
+    
+    page = request.args.get(get_page_parameter(), type=int, default=1)
+    total = cached_count(count_key, query)
+    pagination = Pagination(page=page, total=total, per_page=per_page, css_framework='bootstrap4')
+    if order_by is None:
+        order_by = (model.created_at.desc(), model.id.desc())
+    items = query.order_by(*order_by).offset((page - 1) * per_page).limit(per_page).all()
+    return items, pagination
+
+def read_version(name):
+    return db.session.query(VersionStamp.version).filter_by(name=name).scalar() or 0
+
+def bump_version(name):
+    # Part of the caller's transaction, so the new version and the write commit together
+    db.session.execute(
+        sqlite_insert(VersionStamp).values(name=name, version=1)
+        .on_conflict_do_update(index_elements=[VersionStamp.name], set_={'version': VersionStamp.version + 1})
+    )
+
+# Categories as plain immutable rows, shared by every request of this process
+CategoryInfo = namedtuple('CategoryInfo', 'id name description')
+
+def load_categories():
+    return [CategoryInfo(*row) for row in
+            db.session.query(Category.id, Category.name, Category.description).order_by(Category.id)]
+
+category_registry = VersionedRegistry(load_categories, lambda: read_version('categories'))
+
+def categories_changed():
+    # Call after committing a category write; other workers follow via the version stamp
+    category_registry.invalidate()
+    invalidate_feed_cache()
+
+# Dashboard statistics: running counters and hourly/daily rollups, updated in the
+# same transaction as the write they count
+STAT_METRICS = ('posts_submitted', 'posts_approved', 'moderation_latency', 'likes', 'comments',
+                'reports', 'registrations')
+
+def adjust_counter(name, delta):
+    if delta:
+        db.session.execute(
+            sqlite_insert(StatCounter).values(name=name, value=delta)
+            .on_conflict_do_update(index_elements=[StatCounter.name], set_={'value': StatCounter.value + delta})
+        )
+
+def record_stat(metric, count=1, total=0, at=None):
+    # Add `count` events (and their summed value, e.g. seconds) to the hour and day buckets
+    if not count:
+        return
+    at = at or datetime.utcnow()
+    statement = sqlite_insert(StatRollup).values([
+        {'metric': metric, 'period': period, 'bucket': bucket_start(at, period), 'count': count, 'total': total}
+        for period in ('hour', 'day')
+    ])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[StatRollup.metric, StatRollup.period, StatRollup.bucket],
+        set_={'count': StatRollup.count + statement.excluded.count,
+              'total': StatRollup.total + statement.excluded.total}))
+
+def record_menfess_removal(menfesses):
+    # Counters for deleted menfesses (rows with is_approved and report_count); their
+    # reports go with them
+    adjust_counter('pending_menfesses', -sum(1 for menfess in menfesses if not menfess.is_approved))
+    adjust_counter('reports', -sum(menfess.report_count for menfess in menfesses))
+
+def rebuild_stats():
+    # Recompute the counters and rollups from the tables. Approvals before approved_at
+    # was recorded can't be recovered and are left out of the approval rollups.
+    counters = {
+        'users': db.session.query(func.count(User.id)).scalar(),
+        'pending_menfesses': db.session.query(func.count(Menfess.id)).filter(Menfess.is_approved == False).scalar(),
+        'reports': db.session.query(func.count(Report.id)).scalar(),
+    }
+    moderated = and_(Menfess.approved_at.isnot(None), Menfess.approved_at != Menfess.created_at)
+    sources = [
+        ('posts_submitted', Menfess.created_at, None, None),
+        ('posts_approved', Menfess.approved_at, None, Menfess.approved_at.isnot(None)),
+        ('moderation_latency', Menfess.approved_at,
+         (func.julianday(Menfess.approved_at) - func.julianday(Menfess.created_at)) * 86400, moderated),
+        ('likes', Like.created_at, None, None),
+        ('comments', Comment.created_at, None, None),
+        ('reports', Report.created_at, None, None),
+        ('registrations', User.created_at, None, None),
+    ]
+    formats = {'hour': '%Y-%m-%d %H:00:00', 'day': '%Y-%m-%d 00:00:00'}
+    rows = []
+    for metric, column, value, condition in sources:
+        for period, bucket_format in formats.items():
+            bucket = func.strftime(bucket_format, column)
+            query = db.session.query(bucket, func.count(), func.coalesce(func.sum(value), 0) if value is not None
+                                     else literal(0)).filter(column.isnot(None)).group_by(bucket)
+            if condition is not None:
+                query = query.filter(condition)
+            rows += [{'metric': metric, 'period': period, 'bucket': datetime.fromisoformat(start),
+                      'count': count, 'total': total} for start, count, total in query]
+    
+    db.session.execute(delete(StatCounter))
+    db.session.execute(delete(StatRollup))
+    db.session.execute(StatCounter.__table__.insert(), [{'name': name, 'value': value}
+                                                        for name, value in counters.items()])
+    for batch in batched(rows, app.config['MODERATION_BATCH_SIZE']):
+        db.session.execute(StatRollup.__table__.insert(), batch)
+    return len(rows)
+
+def dashboard_stats(now=None):
+    # Counters plus the last 24 hours and 30 days of each rollup, read in two small queries
+    now = now or datetime.utcnow()
+    counters = dict(db.session.query(StatCounter.name, StatCounter.value))
+    lengths = {'hour': 24, 'day': 30}
+    rollups = {}
+    rows = db.session.query(StatRollup).filter(
+        StatRollup.metric.in_(STAT_METRICS),
+        or_(and_(StatRollup.period == 'hour', StatRollup.bucket > now - timedelta(hours=lengths['hour'])),
+            and_(StatRollup.period == 'day', StatRollup.bucket > now - timedelta(days=lengths['day']))))
+    for row in rows:
+        rollups.setdefault((row.metric, row.period), {})[row.bucket] = (row.count, row.total)
+    
+    trends = []
+    for metric in STAT_METRICS:
+        trend = {'metric': metric}
+        for period, length in lengths.items():
+            buckets = rollups.get((metric, period), {})
+            counts = series({bucket: count for bucket, (count, total) in buckets.items()}, period, now, length)
+            if metric == 'moderation_latency':
+                # Average minutes from submission to approval
+                totals = series({bucket: total for bucket, (count, total) in buckets.items()}, period, now, length)
+                values = [total / count / 60 if count else 0 for count, total in zip(counts, totals)]
+                summary = sum(totals) / sum(counts) / 60 if sum(counts) else None
+            else:
+                values, summary = counts, sum(counts)
+            trend[period] = {'summary': summary, 'sparkline': sparkline(values)}
+        trends.append(trend)
+    return counters, trends
+
+def feed_version():
+    # The version cached pages are keyed by. A shared (redis) page cache keeps it next
+    # to the pages; with the per-process memory cache it lives in a file in the
+    # instance folder, so an invalidation in one worker reaches every worker at once
+    if not isinstance(page_cache, LRUCache):
+        return page_cache.get('feed:version') or '0'
+    try:
+        with open(os.path.join(app.instance_path, 'feed_version')) as version_file:
+            return version_file.read()
+    except FileNotFoundError:
+        return '0'
+
+# Query arguments the feed reads; they make up the page cache key
+FEED_ARGS = {'category', 'sort', 'page', 'before', 'after'}
+
+def feed_cache_key():
+    # Only anonymous visitors without pending flash messages share cached pages.
+    # The key is built from the arguments the feed understands, normalized the way
+    # index() reads them, so unrelated (?utm=...) or reordered arguments share entries.
+    if current_user.is_authenticated or session.get('_flashes'):
+        return None
+    cursors = []
+    for name in ('before', 'after'):
+        if name in request.args:  # Even an invalid cursor switches paginate() to cursor mode
+            cursor = decode_cursor(request.args.get(name))
+            cursors.append(f"{name}={encode_cursor(*cursor) if cursor else ''}")
+    args = [f"category={request.args.get('category', type=int) or ''}",
+            f"sort={'hot' if request.args.get('sort') == 'hot' else 'latest'}",
+            f"page={request.args.get('page', 1, type=int)}", *cursors]
+    theme = 'light'  # Anonymous pages always render with the light theme
+    return f"feed:{feed_version()}:{theme}:{'&'.join(args)}"
+
+def invalidate_feed_cache():
+    # A new version orphans every cached page at once (old entries age out)
+    version = uuid.uuid4().hex
+    if not isinstance(page_cache, LRUCache):
+        page_cache.set('feed:version', version, ttl=0)
+        return
+    version_path = os.path.join(app.instance_path, 'feed_version')
+    temp_path = f'{version_path}.{version}.tmp'
+    with open(temp_path, 'w') as version_file:
+        version_file.write(version)
+    os.replace(temp_path, version_path)
+
+def load_liked_flags(menfesses):
+    # Attach the current user's liked flag to a page of menfesses in one query
+    liked_ids = set()
+    if menfesses and current_user.is_authenticated:
+        ids = [menfess.id for menfess in menfesses]
+        liked_ids = {row[0] for row in db.session.query(Like.menfess_id)
+                     .filter(Like.menfess_id.in_(ids), Like.user_id == current_user.id).all()}
+    
+    for menfess in menfesses:
+        menfess.user_liked = menfess.id in liked_ids
+        if current_user.is_authenticated:
+            menfess.user_liked = like_buffer.liked(menfess.id, current_user.id, menfess.user_liked)
+    
+    return menfesses
+
+def search_menfesses(terms, include_pending=False):
+    # Menfesses matching the search terms in their text, display name or comments,
+    # best bm25 rank first. Returns None when the terms contain no searchable words.
+    expression = match_expression(terms, min_prefix=app.config['SEARCH_MIN_PREFIX'])
+    if expression is None:
+        return None
+    matches = (text(MATCH_SQL)
+               .bindparams(query=expression, comment_weight=app.config['SEARCH_COMMENT_WEIGHT'],
+                           candidates=app.config['SEARCH_MAX_CANDIDATES'])
+               .columns(id=db.Integer, rank=db.Float)
+               .subquery('matches'))
+    query = Menfess.query.join(matches, Menfess.id == matches.c.id)
+    if not include_pending:
+        query = query.filter(Menfess.is_approved == True)
+    return query.order_by(matches.c.rank, Menfess.id.desc())
+
+def paginate_search(query, per_page):
+    # Counting every match would run the whole ranked search a second time, so
+    # search pages only link to the previous and next page
+    pagination = PagePagination(query, per_page)
+    return pagination.items, pagination
+
+def bump_menfess_counter(menfess_id, column, delta=1):
+    # Atomic UPDATE ... SET x = x + delta in the current transaction, returning the new value.
+    # Like and comment changes also re-rank the menfess in the same statement.
+    values = {column: column + delta}
+    if column in (Menfess.like_count, Menfess.comment_count):
+        counts = {Menfess.like_count: Menfess.like_count, Menfess.comment_count: Menfess.comment_count}
+        counts[column] = column + delta
+        values[Menfess.hot_score] = func.hot_score(counts[Menfess.like_count], counts[Menfess.comment_count],
+                                                   Menfess.created_at)
+    return db.session.execute(
+        update(Menfess)
+        .where(Menfess.id == menfess_id)
+        .values(values)
+        .returning(column)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+def approve_menfesses(ids):
+    # Approve pending menfesses in one UPDATE; returns (id, category_id) of those approved
+    now = datetime.utcnow()
+    approved = db.session.execute(
+        update(Menfess)
+        .where(Menfess.id.in_(ids), Menfess.is_approved == False)
+        .values(is_approved=True, approved_at=now)
+        .returning(Menfess.id, Menfess.category_id, Menfess.created_at)
+        .execution_options(synchronize_session=False)
+    ).all()
+    adjust_counter('pending_menfesses', -len(approved))
+    record_stat('posts_approved', len(approved), at=now)
+    record_stat('moderation_latency', len(approved), sum((now - row.created_at).total_seconds() for row in approved),
+                at=now)
+    return approved
+
+def delete_menfesses(ids):
+    # Reject pending menfesses: delete them and their likes, comments and reports with
+    # one statement per table (bulk deletes skip the ORM cascades), releasing their
+    # voice notes together. Like approve_menfesses, published menfesses in the list
+    # (a stale or forged selection) are left alone. Returns the ids that were deleted.
+    rows = (db.session.query(Menfess.id, Menfess.voice_note, Menfess.is_approved, Menfess.report_count)
+            .filter(Menfess.id.in_(ids), Menfess.is_approved == False).all())
+    ids = [row.id for row in rows]
+    if not ids:
+        return []
+    release_media_many('voice', [row.voice_note for row in rows])
+    record_menfess_removal(rows)
+    for model in (Like, Comment, Report):
+        db.session.execute(delete(model).where(model.menfess_id.in_(ids))
+                           .execution_options(synchronize_session=False))
+    db.session.execute(delete(Menfess).where(Menfess.id.in_(ids))
+                       .execution_options(synchronize_session=False))
+    return ids
+
+REASON_SEPARATOR = '\x1f'
+
+def grouped_reports(sort, cursor, per_page):
+    # One row per reported menfess with its report count, first/last report time and
+    # the latest few reasons, from a single GROUP BY over the report table. Rows are
+    # ordered by volume or by latest report; `cursor` ("<key>_<menfess id>") continues
+    # after the last row of the previous page through HAVING.
+    ranked = select(
+        Report.menfess_id, Report.reason, Report.created_at,
+        func.row_number().over(partition_by=Report.menfess_id, order_by=Report.created_at.desc()).label('position'),
+    ).subquery()
+    reports = func.count().label('reports')
+    first_reported = func.min(ranked.c.created_at, type_=db.DateTime).label('first_reported')
+    last_reported = func.max(ranked.c.created_at, type_=db.DateTime).label('last_reported')
+    reasons = func.group_concat(
+        case((ranked.c.position <= app.config['REPORT_SAMPLE_REASONS'], ranked.c.reason)), REASON_SEPARATOR
+    ).label('reasons')
+    key = reports if sort == 'volume' else last_reported
+    
+    grouped = (select(ranked.c.menfess_id, reports, first_reported, last_reported, reasons)
+               .group_by(ranked.c.menfess_id))
+    if cursor:
+        try:
+            value, menfess_id = cursor.rsplit('_', 1)
+            value = int(value) if sort == 'volume' else datetime.fromisoformat(value)
+            menfess_id = int(menfess_id)
+        except ValueError:
+            abort(400)
+        grouped = grouped.having(or_(key < value, (key == value) & (ranked.c.menfess_id < menfess_id)))
+    grouped = grouped.order_by(key.desc(), ranked.c.menfess_id.desc()).limit(per_page + 1).subquery()
+    
+    rows = (db.session.query(Menfess, grouped.c.reports, grouped.c.first_reported,
+                             grouped.c.last_reported, grouped.c.reasons)
+            .join(grouped, Menfess.id == grouped.c.menfess_id)
+            .order_by((grouped.c.reports if sort == 'volume' else grouped.c.last_reported).desc(),
+                      Menfess.id.desc())
+            .all())
+    
+    groups = [{
+        'menfess': menfess,
+        'reports': count,
+        'first_reported': first,
+        'last_reported': last,
+        'reasons': (sample or '').split(REASON_SEPARATOR),
+    } for menfess, count, first, last, sample in rows[:per_page]]
+    next_cursor = None
+    if len(rows) > per_page:
+        last_group = groups[-1]
+        value = last_group['reports'] if sort == 'volume' else last_group['last_reported'].isoformat()
+        next_cursor = f"{value}_{last_group['menfess'].id}"
+    return groups, next_cursor
+
+def store_buffered_likes(likes, unlikes):
+    # Flush callback of the like buffer: one transaction for the whole batch. Counters
+    # of the touched menfesses are recounted from the like table, which stays exact
+    # even when another worker stored some of the same toggles.
+    with app.app_context():
+        try:
+            now = datetime.utcnow()
+            if likes:
+                inserted = db.session.execute(text(
+                    'INSERT INTO "like" (menfess_id, user_id, created_at) '
+                    'SELECT :menfess_id, :user_id, :created_at WHERE EXISTS (SELECT 1 FROM menfess WHERE id = :menfess_id) '
+                    'ON CONFLICT (menfess_id, user_id) DO NOTHING'
+                ).bindparams(bindparam('created_at', type_=db.DateTime)), [{'menfess_id': menfess_id, 'user_id': user_id, 'created_at': now} for menfess_id, user_id in likes])
+                record_stat('likes', max(inserted.rowcount, 0), at=now)
+            if unlikes:
+                like_table = Like.__table__
+                db.session.execute(
+                    delete(like_table).where(like_table.c.menfess_id == bindparam('m'),
+                                             like_table.c.user_id == bindparam('u')),
+                    [{'m': menfess_id, 'u': user_id} for menfess_id, user_id in unlikes])
+            
+            touched = sorted({menfess_id for menfess_id, _ in likes + unlikes})
+            like_count = select(func.count(Like.id)).where(Like.menfess_id == Menfess.id).scalar_subquery()
+            db.session.execute(
+                update(Menfess)
+                .where(Menfess.id.in_(touched))
+                .values(like_count=like_count,
+                        hot_score=func.hot_score(like_count, Menfess.comment_count, Menfess.created_at))
+                .execution_options(synchronize_session=False))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            app.logger.exception(f"Error storing {len(likes) + len(unlikes)} buffered likes")
+            raise
+        invalidate_feed_cache()
+
+like_buffer = LikeBuffer(store_buffered_likes)
+atexit.register(like_buffer.flush_now)
+
+def enqueue(name, delay=0, key=None, **args):
+    # Add a job in the caller's transaction, so it only runs if the work that asked
+    # for it is committed. A job with the same key that is still queued makes this
+    # a no-op. Returns the job, or None when it was already queued.
+    if name not in job_tasks:
+        raise ValueError(f'Unknown job {name}')
+    if key is not None and db.session.query(Job.id).filter_by(key=key, status='queued').first():
+        return None
+    job = Job(name=name, args=json.dumps(args), key=key, max_attempts=app.config['JOB_MAX_ATTEMPTS'],
+              run_at=datetime.utcnow() + timedelta(seconds=delay))
+    db.session.add(job)
+    if has_request_context() and not delay:
+        # Wake the workers once the response (and so the job) has been committed
+        @after_this_request
+        def wake_job_workers(response):
+            job_runner.notify()
+            return response
+    return job
+
+def claim_job():
+    # Take the next due job (or one whose worker's lease ran out). The due job is
+    # looked up with a plain SELECT, so idle polls never take SQLite's write lock;
+    # the UPDATE repeats the conditions, so two workers never run the same job.
+    with app.app_context():
+        while True:
+            now = datetime.utcnow()
+            due = or_(and_(Job.status == 'queued', Job.run_at <= now),
+                      and_(Job.status == 'running', Job.locked_until < now))
+            job_id = db.session.execute(
+                select(Job.id).where(due).order_by(Job.run_at, Job.id).limit(1)
+            ).scalar()
+            if job_id is None:
+                db.session.rollback()
+                return None
+            job = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, due)
+                .values(status='running', attempts=Job.attempts + 1,
+                        locked_until=now + timedelta(seconds=app.config['JOB_LEASE']))
+                .returning(Job.id, Job.name, Job.args, Job.attempts, Job.max_attempts)
+                .execution_options(synchronize_session=False)
+            ).first()
+            db.session.commit()
+            if job is not None:
+                return job
+            # Claimed by another worker in between; look for the next one
+
+def run_job(job):
+    # Run a claimed job; failures are retried with a growing delay until the job
+    # runs out of attempts
+    error = None
+    task = job_tasks.get(job.name)
+    if task is None:
+        error = f'Unknown job {job.name}'
+    elif job.attempts > job.max_attempts:
+        error = 'Too many attempts (the worker running it was lost)'
+    else:
+        try:
+            with app.app_context():
+                task(**json.loads(job.args))
+        except Exception as e:
+            app.logger.exception(f'Job {job.id} ({job.name}) failed')
+            error = f'{type(e).__name__}: {e}'
+    
+    now = datetime.utcnow()
+    if error is None:
+        values = {'status': 'done', 'finished_at': now, 'last_error': None}
+    elif task is not None and job.attempts < job.max_attempts:
+        delay = retry_delay(job.attempts, app.config['JOB_RETRY_DELAY'])
+        values = {'status': 'queued', 'run_at': now + timedelta(seconds=delay), 'last_error': error}
+    else:
+        values = {'status': 'failed', 'finished_at': now, 'last_error': error}
+    with app.app_context():
+        db.session.execute(update(Job).where(Job.id == job.id).values(locked_until=None, **values)
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+
+def schedule_periodic_jobs():
+    # Queue each JOB_SCHEDULE job once its interval has passed since it last finished
+    with app.app_context():
+        now = datetime.utcnow()
+        for name, interval in app.config['JOB_SCHEDULE'].items():
+            key = f'schedule:{name}'
+            if db.session.query(Job.id).filter(Job.key == key, Job.status.in_(['queued', 'running'])).first():
+                continue
+            last = db.session.query(func.max(Job.finished_at)).filter(Job.key == key).scalar()
+            delay = 0 if last is None else max(interval - (now - last).total_seconds(), 0)
+            enqueue(name, delay=delay, key=key)
+        db.session.commit()
+
+job_runner = JobRunner(claim_job, run_job, tick=schedule_periodic_jobs, logger=app.logger)
+atexit.register(job_runner.stop, 5)
+
+def load_secret_key():
+    # Every worker must sign sessions with the same key, so generate it once and
+    # keep it in the instance folder unless one is provided through the environment.
+    # The key is written to a temporary file and linked into place, so the key file
+    # only ever appears complete and the first worker to link it wins.
+    key_path = os.path.join(app.instance_path, 'secret_key')
+    if not os.path.exists(key_path):
+        temp_path = f'{key_path}.{uuid.uuid4().hex}.tmp'
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            with os.fdopen(fd, 'w') as key_file:
+                key_file.write(secrets.token_hex(32))
+            os.link(temp_path, key_path)
+        except FileExistsError:
+            pass  # Another worker linked its key first
+        finally:
+            os.remove(temp_path)
+    with open(key_path) as key_file:
+        return key_file.read().strip()
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer; busy_timeout makes
+    # concurrent writers wait for the lock instead of failing immediately
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute(f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT'])}")
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+    # Lets UPDATE statements (and migrations) compute trending scores in place
+    dbapi_connection.create_function('hot_score', 3, hot_score, deterministic=True)
+
+def create_app(config=None):
+    # Configure the app from MENFESS_* environment variables (values are parsed
+    # as JSON when possible) and optional overrides, then set up extensions.
+    # The app is configured once per process; later calls return it unchanged, and
+    # passing overrides then is an error (they would be silently ignored, e.g. a
+    # different database URI).
+    if 'sqlalchemy' in app.extensions:
+        if config:
+            raise RuntimeError('create_app() was already called in this process; '
+                               'pass config overrides to the first call')
+        return app
+    
+    app.config.from_prefixed_env('MENFESS')
+    if config:
+        app.config.update(config)
+    
+    os.makedirs(app.instance_path, exist_ok=True)
+    os.makedirs(app.config['MEDIA_STAGING_FOLDER'], exist_ok=True)
+    if not app.config['SECRET_KEY']:
+        app.config['SECRET_KEY'] = load_secret_key()
+    
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    is_sqlite = uri.startswith('sqlite')
+    engine_options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    if not is_sqlite or (':memory:' not in uri and uri != 'sqlite://'):
+        engine_options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        engine_options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+        engine_options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+        engine_options.setdefault('pool_pre_ping', True)
+    
+    db.init_app(app)
+    migrate.init_app(app, db)
+    login_manager.init_app(app)
+    
+    with app.app_context():
+        if is_sqlite:
+            event.listen(db.engine, 'connect', set_sqlite_pragmas)
+        event.listen(db.engine, 'before_cursor_execute', start_query_timer)
+        event.listen(db.engine, 'after_cursor_execute', record_query)
+    
+    count_cache.ttl = app.config['PAGINATION_COUNT_TTL']
+    render_cache.maxsize = app.config['RENDER_CACHE_SIZE']
+    broker.queue_size = app.config['STREAM_QUEUE_SIZE']
+    like_buffer.interval = app.config['LIKE_FLUSH_INTERVAL']
+    category_registry.interval = app.config['CATEGORY_CHECK_INTERVAL']
+    job_runner.workers = app.config['JOB_WORKERS']
+    job_runner.poll_interval = app.config['JOB_POLL_INTERVAL']
+    rate_limiter.store = make_bucket_store(app.config['RATE_LIMIT_STORAGE'])
+    if app.config['PROXY_COUNT']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'], x_proto=app.config['PROXY_COUNT'])
+    global page_cache
+    page_cache = make_cache(app.config['PAGE_CACHE_BACKEND'],
+                            maxsize=app.config['PAGE_CACHE_SIZE'],
+                            ttl=app.config['PAGE_CACHE_TTL'])
+    
+    return app
+
+def seed_database(admin_password):
     # Create admin user if not exists
     admin = User.query.filter_by(username='admin').first()
     if not admin:
         admin = User(
             username='admin',
             email='admin@example.com',
-            password=generate_password_hash('admin123'),
+            password=generate_password_hash(admin_password),
             role='admin'
         )
         db.session.add(admin)
         db.session.commit()
     
     # Create default categories if they don't exist
+    changed = False
     default_categories = [
         {'name': 'General', 'description': 'General discussions and topics'},
         {'name': 'Confession', 'description': 'Personal confessions and secrets'},
@@ -166,68 +1090,239 @@ with app.app_context():
         if not existing_category:
             new_category = Category(name=cat['name'], description=cat['description'])
             db.session.add(new_category)
+            changed = True
     
+    if changed:
+        bump_version('categories')
     db.session.commit()
+    
+    # Fill the dashboard statistics the first time (e.g. after upgrading an existing database)
+    if not db.session.query(StatCounter).first():
+        rebuild_stats()
+        db.session.commit()
+
+# Routes for file uploads (fall back to the staged copy while it is still being processed)
+def upload_exists(folder, filename):
+    path = safe_join(folder, filename)
+    return path is not None and os.path.isfile(path)
+
+# Content-addressed uploads and their thumbnails: <sha256>[_<size>].<ext>
+CONTENT_ADDRESSED_RE = re.compile(r'^([0-9a-f]{64}(?:_\d+)?)\.[a-z0-9]+$')
+
+# Players pick a decoder from the type, and .webm would otherwise be sent as video
+AUDIO_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'wav': 'audio/wav',
+    'ogg': 'audio/ogg',
+    'webm': 'audio/webm',
+}
+
+@app.template_filter('audio_mimetype')
+def audio_mimetype(filename):
+    return AUDIO_MIMETYPES.get(filename.rsplit('.', 1)[-1].lower(), 'audio/mpeg')
+
+@app.template_filter('cursor')
+def cursor_filter(item):
+    return encode_cursor(item.created_at, item.id)
+
+def send_upload(folder, filename, published=True, mimetype=None):
+    # A content-addressed name is a fingerprint of the bytes, so once published it is
+    # cached forever with the hash as a strong ETag. Staged copies are replaced by the
+    # processed file under the same URL and must be revalidated.
+    match = CONTENT_ADDRESSED_RE.match(filename)
+    if not published:
+        max_age = 0
+    elif match:
+        max_age = app.config['UPLOAD_CACHE_MAX_AGE']
+    else:
+        max_age = app.config['LEGACY_UPLOAD_MAX_AGE']
+    etag = match.group(1) if match and published else True
+    
+    accel_prefix = app.config['UPLOAD_ACCEL_REDIRECT']
+    path = safe_join(folder, filename)
+    upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+    if accel_prefix and path and os.path.abspath(path).startswith(upload_folder + os.sep):
+        # nginx streams the file (including Range requests) from its internal location
+        relative_path = os.path.relpath(os.path.abspath(path), upload_folder).replace(os.sep, '/')
+        response = app.response_class(mimetype=mimetype or mimetypes.guess_type(filename)[0])
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative_path
+        if etag is not True:
+            response.set_etag(etag)
+        response.make_conditional(request)
+    else:
+        # Werkzeug answers If-None-Match with 304 and Range with 206 partial content,
+        # so seeking in the audio player only fetches the bytes it needs
+        response = send_from_directory(folder, filename, mimetype=mimetype, etag=etag, max_age=max_age)
+    
+    response.cache_control.max_age = max_age
+    if max_age:
+        response.cache_control.public = True
+        response.cache_control.no_cache = None
+        response.cache_control.immutable = bool(match)
+    else:
+        response.cache_control.public = False
+        response.cache_control.no_cache = True
+    return response
 
-# Routes for file uploads
 @app.route('/uploads/profile_pics/<filename>')
 def profile_pic(filename):
-    return send_from_directory(app.config['PROFILE_PICS_FOLDER'], filename)
+    folder = app.config['PROFILE_PICS_FOLDER']
+    size = request.args.get('size', type=int)
+    if size in app.config['AVATAR_SIZES'] and upload_exists(folder, thumbnail_filename(filename, size)):
+        return send_upload(folder, thumbnail_filename(filename, size))
+    if not upload_exists(folder, filename):
+        return send_upload(app.config['MEDIA_STAGING_FOLDER'], filename, published=False)
+    return send_upload(folder, filename)
 
 @app.route('/uploads/voice_notes/<filename>')
 def voice_note(filename):
-    return send_from_directory(app.config['VOICE_NOTES_FOLDER'], filename)
+    folder = app.config['VOICE_NOTES_FOLDER']
+    mimetype = audio_mimetype(filename)
+    if not upload_exists(folder, filename):
+        return send_upload(app.config['MEDIA_STAGING_FOLDER'], filename, published=False, mimetype=mimetype)
+    return send_upload(folder, filename, mimetype=mimetype)
+
+# Request metrics: SQL is counted through engine events and templates through
+# Flask's render signals, both attributed to the request that is running
+# The start time lives on the execution context rather than on the
+# connection: a statement that raises never reaches after_cursor_execute,
+# and a per-connection stack would then pair later queries with the wrong
+# start time and grow for the life of the pooled connection.
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_started
+    if has_request_context() and 'request_stats' in g:
+        g.request_stats.add_query(statement, elapsed)
+
+def start_template_timer(sender, template, context, **extra):
+    if 'request_stats' in g:
+        g.template_started = time.perf_counter()
+
+def record_template(sender, template, context, **extra):
+    if 'template_started' in g:
+        g.request_stats.template_time += time.perf_counter() - g.pop('template_started')
+
+before_render_template.connect(start_template_timer, app)
+template_rendered.connect(record_template, app)
+
+@app.before_request
+def start_request_metrics():
+    if app.config['METRICS_ENABLED']:
+        g.request_stats = RequestStats(time.perf_counter(),
+                                       record_statements=app.config['METRICS_QUERY_LOG_THRESHOLD'] is not None)
+
+@app.after_request
+def record_request_metrics(response):
+    stats = g.pop('request_stats', None)
+    if stats is None:
+        return response
+    duration = time.perf_counter() - stats.started
+    endpoint = request.endpoint or '<unmatched>'
+    metrics.observe(endpoint, response.status_code, duration, stats)
+    
+    threshold = app.config['METRICS_QUERY_LOG_THRESHOLD']
+    if threshold is not None and stats.queries > threshold:
+        statement, times = stats.most_repeated()
+        app.logger.warning(f"{request.method} {request.path} ({endpoint}) ran {stats.queries} SQL queries "
+                           f"in {stats.sql_time * 1000:.1f} ms, {duration * 1000:.1f} ms total; "
+                           f"most repeated ({times}x): {' '.join(statement.split())}")
+    return response
+
+@app.before_request
+def start_job_workers():
+    # Started by the first request (after a server forks its workers); CLI commands
+    # leave the queue to `flask jobs work`
+    if job_runner.workers and not job_runner.running:
+        job_runner.start()
+
+# GET endpoints expensive enough to be throttled like writes
+THROTTLED_READS = {'search'}
+
+@app.before_request
+def throttle_writes():
+    # Runs before the view (and the user loader), so a throttled request is answered
+    # with 429 without reading or writing the main database
+    limit = app.config['RATE_LIMITS'].get(request.endpoint)
+    if not limit or not app.config['RATE_LIMIT_ENABLED']:
+        return
+    if request.method != 'POST' and request.endpoint not in THROTTLED_READS:
+        return
+    keys = [f'{request.endpoint}:ip:{request.remote_addr}']
+    user_id = session.get('_user_id')  # Set by Flask-Login for logged-in users
+    if user_id:
+        keys.append(f'{request.endpoint}:user:{user_id}')
+    retry_after = rate_limiter.hit(keys, limit)
+    if retry_after:
+        abort(429, description='Too many requests, please slow down.', retry_after=retry_after)
+
+# Live updates. Each open stream waits on its own queue and pins a sync worker
+# for as long as the page is open, so the stream only exists with LIVE_UPDATES
+# on, which needs an async worker (gunicorn -k gevent) where it costs a greenlet.
+@app.route('/stream')
+def stream():
+    if not app.config['LIVE_UPDATES']:
+        abort(404)
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscriber = broker.subscribe(last_event_id)
+    response = app.response_class(broker.stream(subscriber, heartbeat=app.config['STREAM_HEARTBEAT']),
+                                  mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the events
+    return response
 
 # Routes
 @app.route('/')
 def index():
-    page = request.args.get(get_page_parameter(), type=int, default=1)
+    cache_key = feed_cache_key()
+    if cache_key:
+        html = page_cache.get(cache_key)
+        if html is not None:
+            return html
+    
     per_page = 5  # Number of menfesses per page
     
-    # Get category filter
+    # Get category filter and sort order (latest or trending)
     category_id = request.args.get('category', type=int)
+    sort = 'hot' if request.args.get('sort') == 'hot' else 'latest'
     
-    # Base query
+    # Base query (category badges come from the registry, not a join)
     menfesses_query = Menfess.query.filter_by(is_approved=True)
     
     # Apply category filter if provided
     if category_id:
         menfesses_query = menfesses_query.filter_by(category_id=category_id)
     
-    # Order by creation date
-    menfesses_query = menfesses_query.order_by(Menfess.created_at.desc())
+    # Get paginated results ordered by creation date, or by the stored trending score
+    order_by = (Menfess.hot_score.desc(), Menfess.id.desc()) if sort == 'hot' else None
+    menfesses, pagination = paginate(menfesses_query, Menfess, per_page, ('index', category_id), order_by)
     
-    # Get total count
-    total = menfesses_query.count()
+    # Get liked flags for the whole page (counts are stored on the menfess)
+    load_liked_flags(menfesses)
     
-    # Create pagination
-    pagination = Pagination(page=page, total=total, per_page=per_page, css_framework='bootstrap4')
-    
-    # Get paginated results
-    menfesses = menfesses_query.offset((page - 1) * per_page).limit(per_page).all()
-    
-    # Get like counts and comment counts for each menfess
-    for menfess in menfesses:
-        menfess.like_count = Like.query.filter_by(menfess_id=menfess.id).count()
-        menfess.comment_count = Comment.query.filter_by(menfess_id=menfess.id).count()
-        if current_user.is_authenticated:
-            menfess.user_liked = Like.query.filter_by(menfess_id=menfess.id, user_id=current_user.id).first() is not None
-        else:
-            menfess.user_liked = False
-    
-    # Get all categories for the filter
-    categories = Category.query.all()
-    
-    # Get current category name if filter is applied
-    current_category = None
-    if category_id:
-        current_category = Category.query.get(category_id)
+    # Categories for the filter come from the in-process registry
+    categories = category_registry.current()
+    current_category = categories.get(category_id)
     
-    return render_template('index.html', 
+    html = render_template('index.html', 
                           menfesses=menfesses, 
                           pagination=pagination, 
                           categories=categories,
-                          current_category=current_category)
+                          current_category=current_category,
+                          sort=sort)
+    # Pages rendered with other arguments carry them in their pagination links, so
+    # they are served from the cache but never stored in it
+    if cache_key and FEED_ARGS.issuperset(request.args):
+        page_cache.set(cache_key, html)
+    return html
+
+@app.route('/search')
+def search():
+    q = request.args.get('q', '').strip()
+    menfesses, pagination = paginate_search(search_menfesses(q), app.config['SEARCH_PER_PAGE'])
+    load_liked_flags(menfesses)
+    return render_template('search.html', menfesses=menfesses, pagination=pagination, q=q)
 
 @app.route('/register', methods=['GET', 'POST'])
 def register():
@@ -266,6 +1361,8 @@ def register():
                 new_user.profile_picture = pic_filename
         
         db.session.add(new_user)
+        adjust_counter('users', 1)
+        record_stat('registrations')
         db.session.commit()
         
         flash('Registration successful! Please login.', 'success')
@@ -341,12 +1438,7 @@ def profile():
             if pic_filename:
                 # Delete old profile picture if it's not the default
                 if current_user.profile_picture != 'default.png':
-                    try:
-                        old_pic_path = os.path.join(app.config['PROFILE_PICS_FOLDER'], current_user.profile_picture)
-                        if os.path.exists(old_pic_path):
-                            os.remove(old_pic_path)
-                    except Exception as e:
-                        print(f"Error deleting old profile picture: {e}")
+                    release_media('avatar', current_user.profile_picture)
                 
                 current_user.profile_picture = pic_filename
         
@@ -374,7 +1466,7 @@ def post_menfess():
         flash('Your account has been suspended', 'danger')
         return redirect(url_for('index'))
     
-    categories = Category.query.all()
+    categories = category_registry.current()
     
     if request.method == 'POST':
         content = request.form.get('content')
@@ -409,8 +1501,20 @@ def post_menfess():
             if voice_filename:
                 new_menfess.voice_note = voice_filename
         
+        now = datetime.utcnow()
+        new_menfess.created_at = now
+        record_stat('posts_submitted', at=now)
+        if new_menfess.is_approved:
+            new_menfess.approved_at = now
+            record_stat('posts_approved', at=now)
+        else:
+            adjust_counter('pending_menfesses', 1)
+        
         db.session.add(new_menfess)
         db.session.commit()
+        if new_menfess.is_approved:
+            invalidate_feed_cache()
+            broker.publish('menfess', {'id': new_menfess.id, 'category_id': new_menfess.category_id})
         
         if current_user.role in ['admin', 'moderator']:
             flash('Menfess posted successfully', 'success')
@@ -424,7 +1528,6 @@ def post_menfess():
 @app.route('/my-menfesses')
 @login_required
 def my_menfesses():
-    page = request.args.get(get_page_parameter(), type=int, default=1)
     per_page = 5  # Number of menfesses per page
     
     # Get category filter
@@ -437,29 +1540,12 @@ def my_menfesses():
     if category_id:
         menfesses_query = menfesses_query.filter_by(category_id=category_id)
     
-    # Order by creation date
-    menfesses_query = menfesses_query.order_by(Menfess.created_at.desc())
-    
-    # Get total count
-    total = menfesses_query.count()
-    
-    # Create pagination
-    pagination = Pagination(page=page, total=total, per_page=per_page, css_framework='bootstrap4')
-    
-    # Get paginated results
-    menfesses = menfesses_query.offset((page - 1) * per_page).limit(per_page).all()
+    # Get paginated results ordered by creation date
+    menfesses, pagination = paginate(menfesses_query, Menfess, per_page, ('my_menfesses', current_user.id, category_id))
     
-    # Get comment counts for each menfess
-    for menfess in menfesses:
-        menfess.comment_count = Comment.query.filter_by(menfess_id=menfess.id).count()
-    
-    # Get all categories for the filter
-    categories = Category.query.all()
-    
-    # Get current category name if filter is applied
-    current_category = None
-    if category_id:
-        current_category = Category.query.get(category_id)
+    # Categories for the filter come from the in-process registry
+    categories = category_registry.current()
+    current_category = categories.get(category_id)
     
     return render_template('my_menfesses.html', 
                           menfesses=menfesses, 
@@ -477,15 +1563,12 @@ def delete_menfess(id):
     
     # Delete voice note file if exists
     if menfess.voice_note:
-        try:
-            voice_note_path = os.path.join(app.config['VOICE_NOTES_FOLDER'], menfess.voice_note)
-            if os.path.exists(voice_note_path):
-                os.remove(voice_note_path)
-        except Exception as e:
-            print(f"Error deleting voice note: {e}")
+        release_media('voice', menfess.voice_note)
     
+    record_menfess_removal([menfess])
     db.session.delete(menfess)
     db.session.commit()
+    invalidate_feed_cache()
     
     flash('Menfess deleted successfully', 'success')
     return redirect(url_for('my_menfesses'))
@@ -509,6 +1592,9 @@ def report_menfess(id):
         )
         
         db.session.add(new_report)
+        bump_menfess_counter(id, Menfess.report_count)
+        adjust_counter('reports', 1)
+        record_stat('reports')
         db.session.commit()
         
         flash('Menfess reported successfully', 'success')
@@ -522,43 +1608,85 @@ def report_menfess(id):
 def like_menfess(id):
     menfess = Menfess.query.get_or_404(id)
     
+    if app.config['LIKE_WRITE_BEHIND']:
+        # Record the toggle in memory; the flush thread stores it with others in one batch
+        liked = like_buffer.toggle(id, current_user.id, lambda: Like.query.filter_by(
+            menfess_id=id, user_id=current_user.id).first() is not None)
+        likes = menfess.like_total
+        invalidate_feed_cache()
+        if menfess.is_approved:
+            broker.publish('like', {'id': id, 'likes': likes})
+        return jsonify({'status': 'liked' if liked else 'unliked', 'likes': likes})
+    
     # Check if user already liked this menfess
     existing_like = Like.query.filter_by(menfess_id=id, user_id=current_user.id).first()
     
     if existing_like:
         # Unlike
         db.session.delete(existing_like)
+        likes = bump_menfess_counter(id, Menfess.like_count, -1)
         db.session.commit()
-        return jsonify({'status': 'unliked', 'likes': Like.query.filter_by(menfess_id=id).count()})
+        invalidate_feed_cache()
+        if menfess.is_approved:
+            broker.publish('like', {'id': id, 'likes': likes})
+        return jsonify({'status': 'unliked', 'likes': likes})
     else:
         # Like
         new_like = Like(menfess_id=id, user_id=current_user.id)
         db.session.add(new_like)
+        likes = bump_menfess_counter(id, Menfess.like_count, 1)
+        record_stat('likes')
         db.session.commit()
-        return jsonify({'status': 'liked', 'likes': Like.query.filter_by(menfess_id=id).count()})
+        invalidate_feed_cache()
+        if menfess.is_approved:
+            broker.publish('like', {'id': id, 'likes': likes})
+        return jsonify({'status': 'liked', 'likes': likes})
 
 # Comment routes
-@app.route('/menfess/<int:id>/comments')
-def view_comments(id):
-    menfess = Menfess.query.get_or_404(id)
+def visible_menfess_or_404(query, id):
+    menfess = query.filter_by(id=id).first_or_404()
     
     # Check if menfess is approved or if current user is the author or admin/moderator
     if not menfess.is_approved and (not current_user.is_authenticated or 
                                    (current_user.id != menfess.user_id and 
                                     current_user.role not in ['admin', 'moderator'])):
         abort(404)
+    return menfess
+
+def comment_page(menfess_id):
+    # One chunk of a thread, oldest first, after the ?after= cursor; each author is
+    # joined into the same query. Returns the comments and the cursor of the next chunk.
+    per_page = app.config['COMMENTS_PER_PAGE']
+    query = Comment.query.options(joinedload(Comment.author)).filter_by(menfess_id=menfess_id)
+    after = decode_cursor(request.args.get('after'))
+    if after:
+        query = query.filter(keyset_condition(Comment.created_at, Comment.id, after, newer=True))
+    comments = query.order_by(Comment.created_at.asc(), Comment.id.asc()).limit(per_page + 1).all()
+    next_cursor = None
+    if len(comments) > per_page:
+        comments = comments[:per_page]
+        next_cursor = encode_cursor(comments[-1].created_at, comments[-1].id)
+    return comments, next_cursor
+
+@app.route('/menfess/<int:id>/comments')
+def view_comments(id):
+    menfess = visible_menfess_or_404(Menfess.query, id)
     
-    # Get comments for this menfess
-    comments = Comment.query.filter_by(menfess_id=id).order_by(Comment.created_at.asc()).all()
+    # First chunk of comments (or the one after ?after=), the rest load while scrolling
+    comments, next_cursor = comment_page(id)
     
-    # Get like count
-    menfess.like_count = Like.query.filter_by(menfess_id=menfess.id).count()
-    if current_user.is_authenticated:
-        menfess.user_liked = Like.query.filter_by(menfess_id=menfess.id, user_id=current_user.id).first() is not None
-    else:
-        menfess.user_liked = False
+    # Get liked flag
+    load_liked_flags([menfess])
     
-    return render_template('view_comments.html', menfess=menfess, comments=comments)
+    return render_template('view_comments.html', menfess=menfess, comments=comments,
+                           next_cursor=next_cursor, first_page='after' not in request.args)
+
+@app.route('/menfess/<int:id>/comments/more')
+def more_comments(id):
+    # Next chunk of a thread for infinite scroll, as rendered comment cards
+    visible_menfess_or_404(Menfess.query, id)
+    comments, next_cursor = comment_page(id)
+    return jsonify({'html': render_template('_comments.html', comments=comments), 'next': next_cursor})
 
 @app.route('/menfess/<int:id>/add-comment', methods=['POST'])
 @login_required
@@ -583,7 +1711,12 @@ def add_comment(id):
     )
     
     db.session.add(new_comment)
+    comments = bump_menfess_counter(id, Menfess.comment_count)
+    record_stat('comments')
     db.session.commit()
+    invalidate_feed_cache()
+    if menfess.is_approved:
+        broker.publish('comment', {'id': id, 'comment_id': new_comment.id, 'comments': comments})
     
     flash('Comment added successfully', 'success')
     return redirect(url_for('view_comments', id=id))
@@ -599,11 +1732,146 @@ def delete_comment(id):
         abort(403)
     
     db.session.delete(comment)
+    bump_menfess_counter(menfess_id, Menfess.comment_count, -1)
     db.session.commit()
+    invalidate_feed_cache()
     
     flash('Comment deleted successfully', 'success')
     return redirect(url_for('view_comments', id=menfess_id))
 
+# Read-only JSON API (v1). Each page is built from one SELECT of just the columns
+# the requested fields need, and carries a strong ETag over its body so clients
+# revalidating an unchanged page get a 304 without it.
+def api_datetime(value):
+    return value.isoformat() + 'Z' if value else None
+
+# Field -> (columns it needs, how it is serialized from a result row)
+MENFESS_FIELDS = {
+    'id': ((Menfess.id,), lambda row: row.id),
+    'content': ((Menfess.content,), lambda row: row.content),
+    'content_html': ((Menfess.id, Menfess.content), lambda row: str(render_menfess(row.id, row.content))),
+    'display_name': ((Menfess.display_name,), lambda row: row.display_name),
+    'category': ((Category.id.label('category_id'), Category.name.label('category_name')),
+                 lambda row: {'id': row.category_id, 'name': row.category_name} if row.category_id else None),
+    'created_at': ((Menfess.created_at,), lambda row: api_datetime(row.created_at)),
+    'like_count': ((Menfess.id, Menfess.like_count), lambda row: row.like_count + like_buffer.delta(row.id)),
+    'comment_count': ((Menfess.comment_count,), lambda row: row.comment_count),
+    'voice_note': ((Menfess.voice_note,), lambda row: {
+        'url': url_for('voice_note', filename=row.voice_note, _external=True),
+        'type': audio_mimetype(row.voice_note),
+    } if row.voice_note else None),
+}
+
+COMMENT_FIELDS = {
+    'id': ((Comment.id,), lambda row: row.id),
+    'content': ((Comment.content,), lambda row: row.content),
+    'created_at': ((Comment.created_at,), lambda row: api_datetime(row.created_at)),
+    'author': ((User.username, User.profile_picture), lambda row: {
+        'username': row.username,
+        'profile_picture': url_for('profile_pic', filename=row.profile_picture, _external=True),
+    }),
+}
+
+CATEGORY_FIELDS = {
+    'id': ((Category.id,), lambda row: row.id),
+    'name': ((Category.name,), lambda row: row.name),
+    'description': ((Category.description,), lambda row: row.description),
+}
+
+def api_fields(spec):
+    # ?fields=a,b selects a sparse fieldset (id is always included); all fields by default
+    requested = request.args.get('fields')
+    if not requested:
+        return list(spec)
+    fields = list(dict.fromkeys(['id'] + [field.strip() for field in requested.split(',') if field.strip()]))
+    unknown = [field for field in fields if field not in spec]
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(spec)}")
+    return fields
+
+def api_select(spec, fields, *extra):
+    # SELECT of the columns behind `fields` plus `extra` (e.g. the cursor columns), each once
+    columns = {}
+    for column in (*extra, *(column for field in fields for column in spec[field][0])):
+        columns.setdefault(column.key, column)
+    return select(*columns.values())
+
+def api_limit():
+    limit = request.args.get('limit', app.config['API_PAGE_SIZE'], type=int)
+    return min(max(limit, 1), app.config['API_MAX_PAGE_SIZE'])
+
+def api_cursor(name):
+    cursor = request.args.get(name)
+    decoded = decode_cursor(cursor)
+    if cursor and decoded is None:
+        abort(400, f'Invalid {name} cursor')
+    return decoded
+
+def api_response(spec, fields, rows, **extra):
+    # Serialize the rows and answer 304 if the client already has this exact body
+    response = jsonify({'items': [{field: spec[field][1](row) for field in fields} for row in rows], **extra})
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest())
+    response.headers['Cache-Control'] = 'no-cache'
+    if request.if_none_match.contains_weak(response.get_etag()[0]):
+        response = app.response_class(status=304, headers={'ETag': response.headers['ETag'],
+                                                           'Cache-Control': 'no-cache'})
+    return response
+
+@app.errorhandler(HTTPException)
+def api_error(error):
+    # API clients get JSON errors; pages keep the default HTML error pages
+    if not request.path.startswith('/api/'):
+        return error
+    response = jsonify({'error': error.name, 'message': error.description})
+    response.status_code = error.code
+    return response
+
+@app.route('/api/v1/menfesses')
+def api_menfesses():
+    # Approved menfesses, newest first; pass `next` back as ?before= for older ones
+    fields = api_fields(MENFESS_FIELDS)
+    limit = api_limit()
+    query = api_select(MENFESS_FIELDS, fields, Menfess.id, Menfess.created_at).where(Menfess.is_approved == True)
+    if 'category' in fields:
+        query = query.outerjoin(Category, Menfess.category_id == Category.id)
+    category_id = request.args.get('category', type=int)
+    if category_id:
+        query = query.where(Menfess.category_id == category_id)
+    before = api_cursor('before')
+    if before:
+        query = query.where(keyset_condition(Menfess.created_at, Menfess.id, before, newer=False))
+    
+    rows = db.session.execute(query.order_by(Menfess.created_at.desc(), Menfess.id.desc()).limit(limit + 1)).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return api_response(MENFESS_FIELDS, fields, rows[:limit], next=next_cursor)
+
+@app.route('/api/v1/menfesses/<int:id>/comments')
+def api_comments(id):
+    # Comments of an approved menfess, oldest first; pass `next` back as ?after= for more
+    fields = api_fields(COMMENT_FIELDS)
+    limit = api_limit()
+    query = (api_select(COMMENT_FIELDS, fields, Comment.id, Comment.created_at)
+             .join(Menfess, Comment.menfess_id == Menfess.id)
+             .where(Comment.menfess_id == id, Menfess.is_approved == True))
+    if 'author' in fields:
+        query = query.join(User, Comment.user_id == User.id)
+    after = api_cursor('after')
+    if after:
+        query = query.where(keyset_condition(Comment.created_at, Comment.id, after, newer=True))
+    
+    rows = db.session.execute(query.order_by(Comment.created_at.asc(), Comment.id.asc()).limit(limit + 1)).all()
+    # An empty page is the only case that needs to know whether the menfess exists
+    if not rows and not db.session.query(Menfess.id).filter_by(id=id, is_approved=True).first():
+        abort(404)
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return api_response(COMMENT_FIELDS, fields, rows[:limit], next=next_cursor)
+
+@app.route('/api/v1/categories')
+def api_categories():
+    fields = api_fields(CATEGORY_FIELDS)
+    rows = db.session.execute(api_select(CATEGORY_FIELDS, fields, Category.id).order_by(Category.name)).all()
+    return api_response(CATEGORY_FIELDS, fields, rows)
+
 # Admin routes
 @app.route('/admin')
 @login_required
@@ -611,14 +1879,14 @@ def admin():
     if current_user.role != 'admin':
         abort(403)
     
-    pending_menfesses = Menfess.query.filter_by(is_approved=False).count()
-    reports = Report.query.count()
-    users = User.query.count()
+    # Precomputed counters and rollups instead of counting the tables
+    counters, trends = dashboard_stats()
     
     return render_template('admin/index.html', 
-                          pending_menfesses=pending_menfesses, 
-                          reports=reports, 
-                          users=users)
+                          pending_menfesses=counters.get('pending_menfesses', 0), 
+                          reports=counters.get('reports', 0), 
+                          users=counters.get('users', 0),
+                          trends=trends)
 
 @app.route('/admin/menfesses')
 @login_required
@@ -626,7 +1894,6 @@ def admin_menfesses():
     if current_user.role not in ['admin', 'moderator']:
         abort(403)
     
-    page = request.args.get(get_page_parameter(), type=int, default=1)
     per_page = 10  # Number of menfesses per page
     
     # Get category filter
@@ -639,25 +1906,12 @@ def admin_menfesses():
     if category_id:
         menfesses_query = menfesses_query.filter_by(category_id=category_id)
     
-    # Order by creation date
-    menfesses_query = menfesses_query.order_by(Menfess.created_at.desc())
-    
-    # Get total count
-    total = menfesses_query.count()
+    # Get paginated results ordered by creation date
+    menfesses, pagination = paginate(menfesses_query, Menfess, per_page, ('admin_menfesses', category_id))
     
-    # Create pagination
-    pagination = Pagination(page=page, total=total, per_page=per_page, css_framework='bootstrap4')
-    
-    # Get paginated results
-    menfesses = menfesses_query.offset((page - 1) * per_page).limit(per_page).all()
-    
-    # Get all categories for the filter
-    categories = Category.query.all()
-    
-    # Get current category name if filter is applied
-    current_category = None
-    if category_id:
-        current_category = Category.query.get(category_id)
+    # Categories for the filter come from the in-process registry
+    categories = category_registry.current()
+    current_category = categories.get(category_id)
     
     return render_template('admin/menfesses.html', 
                           menfesses=menfesses, 
@@ -665,6 +1919,18 @@ def admin_menfesses():
                           categories=categories,
                           current_category=current_category)
 
+@app.route('/admin/search')
+@login_required
+def admin_search():
+    if current_user.role not in ['admin', 'moderator']:
+        abort(403)
+    
+    # Moderators search pending and approved menfesses alike
+    q = request.args.get('q', '').strip()
+    menfesses, pagination = paginate_search(search_menfesses(q, include_pending=True),
+                                            app.config['SEARCH_PER_PAGE'])
+    return render_template('admin/search.html', menfesses=menfesses, pagination=pagination, q=q)
+
 @app.route('/admin/approve-menfess/<int:id>')
 @login_required
 def approve_menfess(id):
@@ -672,8 +1938,10 @@ def approve_menfess(id):
         abort(403)
     
     menfess = Menfess.query.get_or_404(id)
-    menfess.is_approved = True
-    db.session.commit()
+    if approve_menfesses([menfess.id]):
+        db.session.commit()
+        invalidate_feed_cache()
+        broker.publish('menfess', {'id': menfess.id, 'category_id': menfess.category_id})
     
     flash('Menfess approved successfully', 'success')
     return redirect(url_for('admin_menfesses'))
@@ -688,35 +1956,117 @@ def reject_menfess(id):
     
     # Delete voice note file if exists
     if menfess.voice_note:
-        try:
-            voice_note_path = os.path.join(app.config['VOICE_NOTES_FOLDER'], menfess.voice_note)
-            if os.path.exists(voice_note_path):
-                os.remove(voice_note_path)
-        except Exception as e:
-            print(f"Error deleting voice note: {e}")
+        release_media('voice', menfess.voice_note)
     
+    record_menfess_removal([menfess])
     db.session.delete(menfess)
     db.session.commit()
+    invalidate_feed_cache()
     
     flash('Menfess rejected successfully', 'success')
     return redirect(url_for('admin_menfesses'))
 
+@app.route('/admin/menfesses/bulk', methods=['POST'])
+@login_required
+def bulk_moderate():
+    if current_user.role not in ['admin', 'moderator']:
+        abort(403)
+    
+    # JSON from the moderation queue, or a plain form post with checkbox ids
+    data = request.get_json(silent=True)
+    if data is not None:
+        action, ids = data.get('action'), data.get('ids') or []
+    else:
+        action, ids = request.form.get('action'), request.form.getlist('ids')
+    try:
+        ids = sorted({int(menfess_id) for menfess_id in ids})
+    except (TypeError, ValueError):
+        abort(400)
+    if action not in ('approve', 'reject') or len(ids) > app.config['MODERATION_BATCH_SIZE']:
+        abort(400)
+    
+    approved, done = [], []
+    if ids and action == 'approve':
+        approved = approve_menfesses(ids)
+        done = [row.id for row in approved]
+    elif ids:
+        done = delete_menfesses(ids)
+    db.session.commit()
+    
+    if done:
+        invalidate_feed_cache()
+    for row in approved:
+        broker.publish('menfess', {'id': row.id, 'category_id': row.category_id})
+    
+    if data is not None:
+        return jsonify({'status': 'ok', 'action': action, 'ids': done})
+    flash(f"{len(done)} menfesses {'approved' if action == 'approve' else 'rejected'}", 'success')
+    return redirect(request.referrer or url_for('admin_menfesses'))
+
+@app.route('/admin/menfesses/queue')
+@login_required
+def moderation_queue():
+    if current_user.role not in ['admin', 'moderator']:
+        abort(403)
+    
+    # Pending menfesses as JSON, newest first; pass `next` back as ?before= for more
+    query = Menfess.query.filter_by(is_approved=False)
+    category_id = request.args.get('category', type=int)
+    if category_id:
+        query = query.filter_by(category_id=category_id)
+    per_page = min(request.args.get('limit', app.config['MODERATION_QUEUE_PAGE'], type=int),
+                   app.config['MODERATION_BATCH_SIZE'])
+    pagination = CursorPagination(query, Menfess, max(per_page, 1))
+    
+    items = [{
+        'id': menfess.id,
+        'cursor': cursor_filter(menfess),
+        'content_html': str(menfess.process_commands()),
+        'display_name': menfess.display_name,
+        'category': menfess.category.name if menfess.category else 'General',
+        'created_at': menfess.created_at.strftime('%Y-%m-%d %H:%M'),
+        'voice_note': url_for('voice_note', filename=menfess.voice_note) if menfess.voice_note else None,
+        'voice_note_type': audio_mimetype(menfess.voice_note) if menfess.voice_note else None,
+    } for menfess in pagination.items]
+    return jsonify({
+        'items': items,
+        'next': items[-1]['cursor'] if items and pagination.has_older else None,
+    })
+
 @app.route('/admin/reports')
 @login_required
 def admin_reports():
     if current_user.role not in ['admin', 'moderator']:
         abort(403)
     
-    page = request.args.get(get_page_parameter(), type=int, default=1)
-    per_page = 10  # Number of reports per page
-    
-    reports_query = Report.query.order_by(Report.created_at.desc())
-    total = reports_query.count()
+    # Worst first: most reported (default) or most recently reported
+    sort = 'recent' if request.args.get('sort') == 'recent' else 'volume'
+    cursor = request.args.get('after')
+    groups, next_cursor = grouped_reports(sort, cursor, app.config['REPORTS_PER_PAGE'])
     
-    pagination = Pagination(page=page, total=total, per_page=per_page, css_framework='bootstrap4')
-    reports = reports_query.offset((page - 1) * per_page).limit(per_page).all()
+    return render_template('admin/reports.html', groups=groups, sort=sort,
+                           next_cursor=next_cursor, first_page=not cursor)
+
+@app.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if current_user.role != 'admin':
+        abort(403)
     
-    return render_template('admin/reports.html', reports=reports, pagination=pagination)
+    if request.args.get('reset'):
+        metrics.reset()
+        return redirect(url_for('admin_metrics'))
+    return render_template('admin/metrics.html', rows=metrics.summary(),
+                           threshold=app.config['METRICS_QUERY_LOG_THRESHOLD'])
+
+@app.route('/metrics')
+def prometheus_metrics():
+    # Prometheus scrape endpoint for an admin session or the METRICS_TOKEN bearer token
+    token = app.config['METRICS_TOKEN']
+    authorized = token and secrets.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and not (current_user.is_authenticated and current_user.role == 'admin'):
+        abort(404)
+    return app.response_class(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/admin/users')
 @login_required
@@ -724,14 +2074,9 @@ def admin_users():
     if current_user.role != 'admin':
         abort(403)
     
-    page = request.args.get(get_page_parameter(), type=int, default=1)
     per_page = 10  # Number of users per page
     
-    users_query = User.query
-    total = users_query.count()
-    
-    pagination = Pagination(page=page, total=total, per_page=per_page, css_framework='bootstrap4')
-    users = users_query.offset((page - 1) * per_page).limit(per_page).all()
+    users, pagination = paginate(User.query, User, per_page, ('admin_users',))
     
     return render_template('admin/users.html', users=users, pagination=pagination)
 
@@ -771,12 +2116,7 @@ def edit_user(id):
             if pic_filename:
                 # Delete old profile picture if it's not the default
                 if user.profile_picture != 'default.png':
-                    try:
-                        old_pic_path = os.path.join(app.config['PROFILE_PICS_FOLDER'], user.profile_picture)
-                        if os.path.exists(old_pic_path):
-                            os.remove(old_pic_path)
-                    except Exception as e:
-                        print(f"Error deleting old profile picture: {e}")
+                    release_media('avatar', user.profile_picture)
                 
                 user.profile_picture = pic_filename
         
@@ -826,7 +2166,9 @@ def admin_categories():
         
         new_category = Category(name=name, description=description)
         db.session.add(new_category)
+        bump_version('categories')
         db.session.commit()
+        categories_changed()
         
         flash('Category added successfully', 'success')
         return redirect(url_for('admin_categories'))
@@ -854,8 +2196,10 @@ def edit_category(id):
         
         category.name = name
         category.description = description
+        bump_version('categories')
         
         db.session.commit()
+        categories_changed()
         flash('Category updated successfully', 'success')
         return redirect(url_for('admin_categories'))
     
@@ -876,7 +2220,9 @@ def delete_category(id):
         return redirect(url_for('admin_categories'))
     
     db.session.delete(category)
+    bump_version('categories')
     db.session.commit()
+    categories_changed()
     
     flash('Category deleted successfully', 'success')
     return redirect(url_for('admin_categories'))
@@ -891,19 +2237,363 @@ def delete_reported_menfess(id):
     
     # Delete voice note file if exists
     if menfess.voice_note:
-        try:
-            voice_note_path = os.path.join(app.config['VOICE_NOTES_FOLDER'], menfess.voice_note)
-            if os.path.exists(voice_note_path):
-                os.remove(voice_note_path)
-        except Exception as e:
-            print(f"Error deleting voice note: {e}")
+        release_media('voice', menfess.voice_note)
     
     # Delete the menfess (reports will be cascade deleted)
+    record_menfess_removal([menfess])
     db.session.delete(menfess)
     db.session.commit()
+    invalidate_feed_cache()
     
     flash('Reported menfess deleted successfully', 'success')
     return redirect(url_for('admin_reports'))
 
+# CLI commands
+@app.cli.command('init-db')
+def init_db_command():
+    """Apply all migrations and create the admin user and default categories."""
+    upgrade_database()
+    seed_database(app.config['ADMIN_PASSWORD'])
+    click.echo('Database is up to date.')
+
+@app.cli.command('rebuild-counters')
+@click.option('--check', is_flag=True, help='Only report mismatched counters, do not fix them.')
+def rebuild_counters(check):
+    """Recompute the like/comment/report counters stored on each menfess."""
+    actual = actual_counters()
+    
+    mismatched = db.session.query(Menfess.id, *actual.keys(), *actual.values()).filter(
+        or_(*[column != count for column, count in actual.items()])).all()
+    for row in mismatched:
+        click.echo(f'Menfess {row[0]}: stored likes/comments/reports {row[1]}/{row[2]}/{row[3]}, '
+                   f'actual {row[4]}/{row[5]}/{row[6]}')
+    
+    if not mismatched:
+        click.echo('All counters are correct.')
+    elif check:
+        click.echo(f'{len(mismatched)} menfesses have wrong counters.')
+        raise SystemExit(1)
+    else:
+        store_actual_counters()
+        db.session.commit()
+        click.echo(f'Rebuilt counters for {len(mismatched)} menfesses.')
+
+def actual_counters():
+    # Counter column -> subquery counting the rows it stands for
+    return {
+        Menfess.like_count: select(func.count(Like.id)).where(Like.menfess_id == Menfess.id).scalar_subquery(),
+        Menfess.comment_count: select(func.count(Comment.id)).where(Comment.menfess_id == Menfess.id).scalar_subquery(),
+        Menfess.report_count: select(func.count(Report.id)).where(Report.menfess_id == Menfess.id).scalar_subquery(),
+    }
+
+@job_tasks.task('rebuild-counters')
+def store_actual_counters():
+    db.session.execute(update(Menfess).values(actual_counters()).execution_options(synchronize_session=False))
+    refresh_hot_scores()
+    db.session.commit()
+    invalidate_feed_cache()
+
+def refresh_hot_scores():
+    # Recompute every trending score from the stored counters in one statement
+    return db.session.execute(
+        update(Menfess)
+        .values(hot_score=func.hot_score(Menfess.like_count, Menfess.comment_count, Menfess.created_at))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+@job_tasks.task('refresh-hot-scores')
+def refresh_hot_scores_job():
+    refresh_hot_scores()
+    db.session.commit()
+    invalidate_feed_cache()
+
+@app.cli.command('refresh-hot-scores')
+def refresh_hot_scores_command():
+    """Recompute the trending scores, e.g. after changing HOT_DECAY or HOT_COMMENT_WEIGHT."""
+    count = refresh_hot_scores()
+    db.session.commit()
+    invalidate_feed_cache()
+    click.echo(f'Refreshed trending scores for {count} menfesses.')
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the dashboard counters and hourly/daily rollups from the tables."""
+    count = rebuild_stats()
+    db.session.commit()
+    click.echo(f'Rebuilt dashboard statistics ({count} rollup buckets).')
+
+@job_tasks.task('rebuild-stats')
+def rebuild_stats_job():
+    rebuild_stats()
+    db.session.commit()
+
+@app.cli.command('rebuild-search')
+def rebuild_search():
+    """Rebuild the full-text search indexes from the menfess and comment tables."""
+    for statement in REBUILD_SEARCH:
+        db.session.execute(text(statement))
+    db.session.commit()
+    click.echo('Search indexes rebuilt.')
+
+@app.cli.command('process-media')
+def process_media_command():
+    """Process uploads left in the staging folder (e.g. after a worker restart)."""
+    staged = [filename for filename in os.listdir(app.config['MEDIA_STAGING_FOLDER'])
+              if not filename.endswith('.tmp')]
+    for filename in staged:
+        kind = 'avatar' if allowed_image_file(filename) else 'voice'
+        click.echo(f'Processing {kind} {filename}')
+        process_media(kind, filename)
+    click.echo(f'Processed {len(staged)} staged uploads.')
+
+@app.cli.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='Only list the files that would be removed.')
+def gc_uploads(dry_run):
+    """Remove uploads that are no longer referenced by any user or menfess."""
+    removed = collect_unused_uploads(dry_run, click.echo)
+    click.echo(f"{'Would remove' if dry_run else 'Removed'} {removed} files.")
+
+@job_tasks.task('gc-uploads')
+def collect_unused_uploads(dry_run=False, echo=app.logger.info):
+    removed = 0
+    
+    # Uploads that failed processing but were published anyway by older versions
+    for media in MediaFile.query.filter_by(status='failed').all():
+        paths = [path for path in media_paths(media.kind, media.filename) if os.path.exists(path)]
+        for path in paths:
+            echo(f'Removing {path}')
+        removed += len(paths)
+        if paths and not dry_run:
+            discard_media(media.kind, media.filename)
+            media.ref_count = 0
+    
+    # Live references are read from the tables themselves, so a drifted ref_count
+    # can never cause a file in use to be deleted
+    live = {
+        'avatar': {row[0] for row in db.session.query(User.profile_picture).distinct()},
+        'voice': {row[0] for row in db.session.query(Menfess.voice_note)
+                  .filter(Menfess.voice_note.isnot(None)).distinct()},
+    }
+    grace = app.config['UPLOAD_GC_GRACE']
+    cutoff = time.time() - grace
+    
+    # Media records whose last reference was released
+    candidates = (db.session.query(MediaFile.id, MediaFile.kind, MediaFile.filename, MediaFile.created_at)
+                  .filter(MediaFile.ref_count <= 0).all())
+    db.session.commit()
+    for media in candidates:
+        if media.filename in live[media.kind] or (datetime.utcnow() - media.created_at).total_seconds() < grace:
+            continue
+        paths = [path for path in media_paths(media.kind, media.filename) if os.path.exists(path)]
+        if dry_run:
+            for path in paths:
+                echo(f'Removing {path}')
+            removed += len(paths)
+            continue
+        # A re-upload of the same content may have taken a reference since the SELECT,
+        # so only the rows this DELETE removes are unlinked. The files go while the
+        # transaction still holds the write lock: an upload waiting on it sees them
+        # gone afterwards and stages its own copy again.
+        deleted = db.session.execute(
+            delete(MediaFile).where(MediaFile.id == media.id, MediaFile.ref_count <= 0)
+            .returning(MediaFile.id).execution_options(synchronize_session=False)
+        ).scalar()
+        if deleted is not None:
+            for path in paths:
+                echo(f'Removing {path}')
+                os.remove(path)
+            removed += len(paths)
+        db.session.commit()
+    
+    # Files on disk without any reference (e.g. uploads from before the blob store).
+    # Files with a media record are only ever removed through the DELETE above.
+    recorded = {kind: set() for kind in MEDIA_FOLDERS}
+    for kind, filename in db.session.query(MediaFile.kind, MediaFile.filename):
+        recorded[kind].add(filename)
+    for kind, config_key in MEDIA_FOLDERS.items():
+        folder = app.config[config_key]
+        keep = set()
+        for filename in live[kind] | recorded[kind]:
+            keep.update(os.path.basename(path) for path in media_paths(kind, filename))
+        for filename in os.listdir(folder):
+            path = os.path.join(folder, filename)
+            if filename in keep or not os.path.isfile(path) or os.path.getmtime(path) > cutoff:
+                continue
+            echo(f'Removing {path}')
+            removed += 1
+            if not dry_run:
+                os.remove(path)
+    
+    # Partial uploads left behind by interrupted requests
+    staging_folder = app.config['MEDIA_STAGING_FOLDER']
+    for filename in os.listdir(staging_folder):
+        path = os.path.join(staging_folder, filename)
+        if filename.endswith('.tmp') and os.path.getmtime(path) < cutoff:
+            echo(f'Removing {path}')
+            removed += 1
+            if not dry_run:
+                os.remove(path)
+    
+    db.session.commit()
+    return removed
+
+@app.cli.command('seed-data')
+@click.option('--users', default=1000, show_default=True)
+@click.option('--categories', default=10, show_default=True)
+@click.option('--menfesses', default=10000, show_default=True)
+@click.option('--comments', default=30000, show_default=True)
+@click.option('--likes', default=50000, show_default=True)
+@click.option('--reports', default=1000, show_default=True)
+@click.option('--days', default=30, show_default=True, help='Spread the rows over this many days up to now.')
+@click.option('--password', default='password', show_default=True, help='Password of every generated user.')
+@click.option('--seed', default=0, show_default=True, help='Random seed; the same seed gives the same data.')
+def seed_data(users, categories, menfesses, comments, likes, reports, days, password, seed):
+    """Add synthetic users, categories, menfesses, comments, likes and reports for load tests."""
+    if menfesses and not (users and categories):
+        raise click.UsageError('Menfesses need at least one generated user and category.')
+    if (comments or likes or reports) and not menfesses:
+        raise click.UsageError('Comments, likes and reports need generated menfesses.')
+    
+    # Generated ids follow the existing rows; the new rows only reference each other
+    first = {model: (db.session.query(func.max(model.id)).scalar() or 0) + 1 for model in (User, Category, Menfess)}
+    user_range = (first[User], users)
+    category_range = (first[Category], categories)
+    menfess_range = (first[Menfess], menfesses)
+    data = SyntheticData(seed, start=datetime.utcnow() - timedelta(days=days), days=days)
+    
+    tables = [
+        (User, data.users(first[User], users, generate_password_hash(password))),
+        (Category, data.categories(first[Category], categories)),
+        (Menfess, data.menfesses(*menfess_range, user_range, category_range)),
+        (Comment, data.comments(comments, user_range, menfess_range)),
+        (Like, data.likes(likes, user_range, menfess_range)),
+        (Report, data.reports(reports, user_range, menfess_range)),
+    ]
+    for model, rows in tables:
+        started = time.perf_counter()
+        count = 0
+        for batch in batched(rows, app.config['MODERATION_BATCH_SIZE']):
+            db.session.execute(model.__table__.insert(), batch)
+            count += len(batch)
+        click.echo(f'{model.__tablename__}: {count} rows in {time.perf_counter() - started:.1f}s')
+    
+    if categories:
+        bump_version('categories')
+    db.session.execute(update(Menfess).values(actual_counters())
+                       .where(Menfess.id >= first[Menfess]).execution_options(synchronize_session=False))
+    refresh_hot_scores()
+    rebuild_stats()
+    db.session.commit()
+    invalidate_feed_cache()
+    click.echo(f"Done. Generated users log in as user{first[User]}..user{first[User] + users - 1} "
+               f"with password '{password}'.")
+
+# Maintenance jobs (scheduled through JOB_SCHEDULE or queued with `flask jobs enqueue`)
+@job_tasks.task('analyze')
+def analyze_database():
+    # Refresh the query planner statistics
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+@job_tasks.task('vacuum')
+def vacuum_database():
+    # VACUUM cannot run inside a transaction; it rewrites the whole file, so it is
+    # left to be queued by hand rather than scheduled
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.exec_driver_sql('VACUUM')
+
+@job_tasks.task('purge-jobs')
+def purge_jobs(days=None):
+    cutoff = datetime.utcnow() - timedelta(days=app.config['JOB_RETENTION_DAYS'] if days is None else days)
+    count = db.session.execute(
+        delete(Job).where(Job.status.in_(['done', 'failed']), Job.finished_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return count
+
+@app.cli.group('jobs')
+def jobs_group():
+    """Inspect and run the background job queue."""
+
+@jobs_group.command('list')
+@click.option('--status', type=click.Choice(['queued', 'running', 'done', 'failed']))
+@click.option('--limit', default=50, show_default=True)
+def list_jobs(status, limit):
+    """Show the most recent jobs."""
+    query = Job.query
+    if status:
+        query = query.filter_by(status=status)
+    for job in query.order_by(Job.id.desc()).limit(limit).all():
+        click.echo(f'{job.id:>6} {job.status:<8} {job.name:<20} attempts {job.attempts}/{job.max_attempts} '
+                   f"run at {job.run_at:%Y-%m-%d %H:%M:%S} {job.args if job.args != '{}' else ''}")
+        if job.last_error:
+            click.echo(f'       {job.last_error}')
+    counts = db.session.query(Job.status, func.count(Job.id)).group_by(Job.status).all()
+    click.echo(', '.join(f'{count} {status}' for status, count in sorted(counts)) or 'No jobs.')
+
+@jobs_group.command('enqueue')
+@click.argument('name')
+@click.option('--delay', default=0, show_default=True, help='Seconds to wait before running it.')
+@click.option('--arg', 'args', multiple=True, metavar='KEY=VALUE', help='Job argument (values are parsed as JSON when possible).')
+def enqueue_job(name, delay, args):
+    """Queue a job by name."""
+    if name not in job_tasks:
+        raise click.BadParameter(f"choose from {', '.join(job_tasks)}", param_hint='NAME')
+    kwargs = {}
+    for arg in args:
+        key, separator, value = arg.partition('=')
+        if not separator:
+            raise click.BadParameter(f'{arg} is not KEY=VALUE', param_hint='--arg')
+        try:
+            kwargs[key] = json.loads(value)
+        except ValueError:
+            kwargs[key] = value
+    job = enqueue(name, delay=delay, **kwargs)
+    db.session.commit()
+    click.echo(f'Queued job {job.id} ({name}).')
+
+@jobs_group.command('work')
+@click.option('--workers', type=int, help='Worker threads (default JOB_WORKERS).')
+@click.option('--once', is_flag=True, help='Run the jobs that are due now and exit.')
+def work_jobs(workers, once):
+    """Run queued and scheduled jobs until interrupted."""
+    if once:
+        schedule_periodic_jobs()
+        click.echo(f'Ran {job_runner.run_pending()} jobs.')
+        return
+    job_runner.workers = workers or app.config['JOB_WORKERS'] or 1
+    job_runner.start()
+    click.echo(f'Running jobs with {job_runner.workers} workers (Ctrl+C to stop).')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        job_runner.stop()
+
+@jobs_group.command('retry')
+@click.argument('job_id', type=int)
+def retry_job(job_id):
+    """Queue a failed job again with fresh attempts."""
+    job = db.session.get(Job, job_id)
+    if job is None or job.status != 'failed':
+        raise click.ClickException(f'Job {job_id} is not a failed job.')
+    job.status = 'queued'
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.finished_at = None
+    db.session.commit()
+    click.echo(f'Queued job {job_id} again.')
+
+@jobs_group.command('purge')
+@click.option('--days', type=int, help='Keep finished jobs this recent (default JOB_RETENTION_DAYS).')
+def purge_jobs_command(days):
+    """Delete finished and failed jobs older than the retention period."""
+    click.echo(f'Deleted {purge_jobs(days)} jobs.')
+
 if __name__ == '__main__':
+    create_app()
+    with app.app_context():
+        upgrade_database()
+        seed_database(app.config['ADMIN_PASSWORD'])
     app.run(debug=True)
@@ -0,0 +1,82 @@
+"""Measure like throughput during a like storm, with and without write-behind.
+
+Creates a throwaway database, then has several threads toggle likes on one
+menfess through the Flask test client as different logged-in users. Runs the
+synchronous path and the write-behind buffer (LIKE_WRITE_BEHIND) for the same
+time and checks that the stored counter matches the like rows afterwards.
+
+    python benchmarks/like_storm.py --threads 8 --seconds 5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def storm(app, users, threads, seconds):
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        clients = []
+        for user_id in users[index::threads]:
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+            clients.append(client)
+        while time.perf_counter() < deadline:
+            for client in clients:
+                response = client.post('/like-menfess/1')
+                assert response.status_code == 200, response.status_code
+                counts[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(counts), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from app import create_app, db, like_buffer, Like, Menfess, User
+
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+            'RATE_LIMIT_ENABLED': False,
+            'MEDIA_STAGING_FOLDER': os.path.join(tmp, 'staging'),
+        })
+        with app.app_context():
+            db.create_all()
+            db.session.add_all([User(id=i, username=f'user{i}', email=f'user{i}@example.com', password='x')
+                                for i in range(1, args.users + 1)])
+            db.session.add(Menfess(id=1, content='viral', user_id=1, is_approved=True))
+            db.session.commit()
+
+        print(f'{args.threads} threads, {args.users} users, {args.seconds:g}s per mode')
+        for label, write_behind in (('synchronous', False), ('write-behind', True)):
+            app.config['LIKE_WRITE_BEHIND'] = write_behind
+            requests, elapsed = storm(app, list(range(1, args.users + 1)), args.threads, args.seconds)
+            like_buffer.flush_now()
+            with app.app_context():
+                stored = db.session.get(Menfess, 1).like_count
+                actual = Like.query.filter_by(menfess_id=1).count()
+            status = 'ok' if stored == actual else f'MISMATCH (stored {stored}, actual {actual})'
+            print(f'{label:13} {requests / elapsed:9.1f} likes/s  counter {status}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,348 @@
+"""Load-test the main pages on a synthetic dataset and write the results as JSON.
+
+Seeds a throwaway SQLite database with `flask seed-data` (or reuses one given
+with --database), then sends requests to each scenario from several threads and
+reports p50/p95/p99 latency and throughput. The `client` driver calls the app
+in-process through the Flask test client; the `http` driver starts a local
+server (`flask run`, or gunicorn with --gunicorn) on the same database and
+talks to it over HTTP.
+
+    python benchmarks/load_test.py --driver client --output before.json
+    python benchmarks/load_test.py --driver http --gunicorn "-w 4" --baseline before.json
+
+With --baseline, a scenario whose p95 grew by more than --tolerance percent is
+reported as a regression and the exit status is 1.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ADMIN_PASSWORD = 'admin-load-test'
+
+
+class Target:
+    # What the scenarios pick from: seeded ids and the generated users' password
+    def __init__(self, menfess_ids, user_ids, category_ids, password):
+        self.menfess_ids = menfess_ids
+        self.user_ids = user_ids
+        self.category_ids = category_ids
+        self.password = password
+
+
+# name -> (role, method, expected status, request builder)
+SCENARIOS = {
+    'index': ('anonymous', 'GET', 200, lambda rng, target: (f'/?page={rng.randint(1, 5)}', None)),
+    'index_hot': ('anonymous', 'GET', 200, lambda rng, target: ('/?sort=hot', None)),
+    'search': ('anonymous', 'GET', 200, lambda rng, target: ('/search?q=kampus', None)),
+    'view_comments': ('anonymous', 'GET', 200,
+                      lambda rng, target: (f'/menfess/{rng.choice(target.menfess_ids)}/comments', None)),
+    'like_menfess': ('user', 'POST', 200,
+                     lambda rng, target: (f'/like-menfess/{rng.choice(target.menfess_ids)}', {})),
+    'post_menfess': ('user', 'POST', 302, lambda rng, target: ('/post-menfess', {
+        'content': f'Load test menfess {rng.random()}', 'category_id': str(rng.choice(target.category_ids)),
+        'display_name_type': 'anonymous'})),
+    'admin': ('admin', 'GET', 200, lambda rng, target: ('/admin', None)),
+    'admin_menfesses': ('admin', 'GET', 200, lambda rng, target: ('/admin/menfesses', None)),
+    'admin_reports': ('admin', 'GET', 200, lambda rng, target: ('/admin/reports', None)),
+    'admin_users': ('admin', 'GET', 200, lambda rng, target: ('/admin/users', None)),
+}
+
+
+class ClientSession:
+    # Flask test client logged in by setting the session directly
+    def __init__(self, app, user_id):
+        self.client = app.test_client()
+        if user_id is not None:
+            with self.client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+                session['_fresh'] = True
+
+    def request(self, method, path, data):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPSession:
+    # Cookie-keeping HTTP client logged in through the login form
+    def __init__(self, base_url, username=None, password=None):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect)
+        if username is not None:
+            status = self.request('POST', '/login', {'username': username, 'password': password})
+            if status != 302:
+                raise RuntimeError(f'Login as {username} failed with status {status}')
+
+    def request(self, method, path, data):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of sorted values
+    if not values:
+        return 0
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+def run_scenario(make_session, target, name, requests, concurrency, warmup, seed):
+    role, method, expected, build = SCENARIOS[name]
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    sessions = [make_session(role, index) for index in range(concurrency)]
+
+    def worker(index):
+        rng = random.Random(f'{seed}-{name}-{index}')
+        session = sessions[index]
+        count = requests // concurrency + (index < requests % concurrency)
+        for _ in range(warmup):
+            session.request(method, *build(rng, target))
+        for _ in range(count):
+            path, data = build(rng, target)
+            started = time.perf_counter()
+            status = session.request(method, path, data)
+            latencies[index].append(time.perf_counter() - started)
+            if status != expected:
+                errors[index] += 1
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    values = sorted(value for worker_latencies in latencies for value in worker_latencies)
+    return {
+        'requests': len(values),
+        'errors': sum(errors),
+        'throughput_rps': round(len(values) / elapsed, 1),
+        'mean_ms': round(sum(values) / len(values) * 1000, 2),
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(values[-1] * 1000, 2),
+    }
+
+
+def seed(app, args):
+    from app import db, seed_database, seed_data
+
+    with app.app_context():
+        db.create_all()
+        seed_database(ADMIN_PASSWORD)
+    options = []
+    for option in ('users', 'categories', 'menfesses', 'comments', 'likes', 'reports', 'password', 'seed'):
+        options += [f'--{option}', str(getattr(args, option))]
+    result = app.test_cli_runner().invoke(seed_data, options)
+    if result.exit_code:
+        raise SystemExit(result.output or result.exception)
+    print(result.output, end='')
+
+
+def load_target(app, password):
+    from app import db, Category, Menfess, User
+
+    with app.app_context():
+        # Scenarios hit the most active approved menfesses, like real traffic does
+        menfess_ids = [row[0] for row in db.session.query(Menfess.id).filter_by(is_approved=True)
+                       .order_by(Menfess.hot_score.desc()).limit(200)]
+        user_ids = [row[0] for row in db.session.query(User.id).filter_by(role='user', is_suspended=False)
+                    .order_by(User.id.desc()).limit(200)]
+        category_ids = [row[0] for row in db.session.query(Category.id)]
+        admin_id = db.session.query(User.id).filter_by(username='admin').scalar()
+    if not menfess_ids or not user_ids:
+        raise SystemExit('The database has no approved menfesses or users to test with.')
+    return Target(menfess_ids, user_ids, category_ids, password), admin_id
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env, args, log_path):
+    port = free_port()
+    if args.gunicorn is not None:
+        command = [sys.executable, '-m', 'gunicorn', *shlex.split(args.gunicorn),
+                   '-b', f'127.0.0.1:{port}', 'wsgi:app']
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'wsgi', 'run', '--port', str(port), '--no-reload']
+    with open(log_path, 'w') as log:
+        server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            with open(log_path) as log:
+                raise SystemExit(f'Server exited:\n{log.read()}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return server, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise SystemExit('Server did not start within 30 seconds.')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    # Print the p95 and throughput change per scenario; returns the regressed scenarios
+    regressions = []
+    print(f'\nAgainst baseline {baseline["meta"].get("commit")} ({baseline["meta"].get("driver")} driver):')
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        p95 = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+        rps = (result['throughput_rps'] - before['throughput_rps']) / before['throughput_rps'] * 100
+        regressed = p95 > tolerance
+        print(f'{name:16} p95 {p95:+7.1f}%  throughput {rps:+7.1f}%{"  REGRESSION" if regressed else ""}')
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--driver', choices=('client', 'http'), default='client')
+    parser.add_argument('--gunicorn', metavar='ARGS',
+                        help='Serve with gunicorn and these options (e.g. "-w 4") instead of flask run')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help='Comma-separated scenarios (default: all)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per thread first')
+    parser.add_argument('--database', help='Use this SQLite database instead of seeding a new one; '
+                                           'the admin password must be ' + ADMIN_PASSWORD)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--menfesses', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=30000)
+    parser.add_argument('--likes', type=int, default=50000)
+    parser.add_argument('--reports', type=int, default=1000)
+    parser.add_argument('--password', default='password', help='Password of the generated users')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare with the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=20, help='Allowed p95 growth in percent')
+    args = parser.parse_args()
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.abspath(args.database) if args.database else os.path.join(tmp, 'load.db')
+        config = {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + database,
+            'SECRET_KEY': 'load-test',
+            'RATE_LIMIT_ENABLED': False,
+            'MEDIA_STAGING_FOLDER': os.path.join(tmp, 'staging'),
+        }
+        from app import create_app
+
+        app = create_app(config)
+        if not args.database:
+            seed(app, args)
+        target, admin_id = load_target(app, args.password)
+
+        server = None
+        if args.driver == 'http':
+            env = dict(os.environ, **{f'MENFESS_{key}': json.dumps(value) if not isinstance(value, str) else value
+                                      for key, value in config.items()})
+            server, base_url = start_server(env, args, os.path.join(tmp, 'server.log'))
+
+            def make_session(role, index):
+                if role == 'admin':
+                    return HTTPSession(base_url, 'admin', ADMIN_PASSWORD)
+                if role == 'user':
+                    user_id = target.user_ids[index % len(target.user_ids)]
+                    return HTTPSession(base_url, f'user{user_id}', target.password)
+                return HTTPSession(base_url)
+        else:
+            def make_session(role, index):
+                user_id = {'admin': admin_id, 'user': target.user_ids[index % len(target.user_ids)]}.get(role)
+                return ClientSession(app, user_id)
+
+        results = {}
+        try:
+            print(f'{args.driver} driver, {args.requests} requests per scenario, {args.concurrency} threads')
+            for name in scenarios:
+                results[name] = result = run_scenario(make_session, target, name, args.requests,
+                                                      args.concurrency, args.warmup, args.seed)
+                print(f'{name:16} {result["throughput_rps"]:8.1f} req/s  p50 {result["p50_ms"]:7.1f} ms  '
+                      f'p95 {result["p95_ms"]:7.1f} ms  p99 {result["p99_ms"]:7.1f} ms  errors {result["errors"]}')
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'driver': args.driver,
+            'server': (f'gunicorn {args.gunicorn}' if args.gunicorn is not None else 'flask run')
+                      if args.driver == 'http' else None,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'dataset': args.database or {key: getattr(args, key) for key in
+                                         ('users', 'categories', 'menfesses', 'comments', 'likes', 'reports', 'seed')},
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare the single-pass menfess command renderer with the old four-regex version.
+
+    python benchmarks/markup_render.py --size 20000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import LRUCache  # noqa: E402
+from markup import render_commands  # noqa: E402
+
+
+def legacy_process_commands(content):
+    # Menfess.process_commands() as it was before the tokenizer
+    content = re.sub(r'#bold#(.*?)#bold#', r'<strong>\1</strong>', content)
+    content = re.sub(r'#italic#(.*?)#italic#', r'<em>\1</em>', content)
+    content = re.sub(r'#color:(.*?)#(.*?)#color#', r'<span style="color:\1">\2</span>', content)
+    content = re.sub(r'#quote#(.*?)#quote#', r'<blockquote>\1</blockquote>', content)
+    return content
+
+
+def make_post(size, rng):
+    words = ['aku', 'kamu', 'kuliah', 'kantin', 'unsri', 'dosen', 'tugas', 'hujan', 'pagi', 'malam']
+    snippets = ['#bold#{}#bold#', '#italic#{}#italic#', '#color:red#{}#color#', '#quote#{}#quote#', '{}']
+    parts = []
+    length = 0
+    while length < size:
+        text = ' '.join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+        part = rng.choice(snippets).format(text)
+        parts.append(part)
+        length += len(part) + 1
+    return ' '.join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=20000, help='characters per post')
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    posts = [make_post(args.size, rng) for _ in range(args.posts)]
+    cache = LRUCache(maxsize=args.posts)
+
+    def cached():
+        for post_id, post in enumerate(posts):
+            key = (post_id, hash(post))
+            if cache.get(key) is None:
+                cache.set(key, render_commands(post))
+
+    cases = {
+        'legacy (4 x re.sub)': lambda: [legacy_process_commands(post) for post in posts],
+        'tokenizer': lambda: [render_commands(post) for post in posts],
+        'tokenizer + LRU (warm)': cached,
+    }
+    cached()
+
+    print(f'{args.posts} posts of ~{args.size} characters, best of {args.repeat}')
+    for name, func in cases.items():
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f'{name:24} {best * 1000 / args.posts:9.3f} ms/post')
+
+
+if __name__ == '__main__':
+    main()
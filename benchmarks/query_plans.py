@@ -0,0 +1,116 @@
+"""Show the hot-path query plans and timings before and after the model indexes.
+
+Seeds a throwaway SQLite database with the app's schema, drops the secondary
+indexes, runs EXPLAIN QUERY PLAN and times each query, then builds the indexes
+and repeats.
+
+    python benchmarks/query_plans.py --menfesses 200000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from app import db  # noqa: E402
+
+QUERIES = {
+    'feed': 'SELECT id FROM menfess WHERE is_approved = 1 '
+            'ORDER BY created_at DESC, id DESC LIMIT 5',
+    'feed by category': 'SELECT id FROM menfess WHERE is_approved = 1 AND category_id = 3 '
+                        'ORDER BY created_at DESC, id DESC LIMIT 5',
+    'moderation queue': 'SELECT id FROM menfess WHERE is_approved = 0 '
+                        'ORDER BY created_at DESC, id DESC LIMIT 10',
+    'my menfesses': 'SELECT id FROM menfess WHERE user_id = 42 '
+                    'ORDER BY created_at DESC, id DESC LIMIT 5',
+    'comments of menfess': 'SELECT id FROM comment WHERE menfess_id = 1234 ORDER BY created_at ASC',
+    'like counts': 'SELECT menfess_id, count(id) FROM "like" WHERE menfess_id IN (1, 2, 3, 4, 5) '
+                   'GROUP BY menfess_id',
+    'report queue': 'SELECT id FROM report ORDER BY created_at DESC, id DESC LIMIT 10',
+    'reports of menfess': 'SELECT id FROM report WHERE menfess_id = 1234',
+    'report triage': 'SELECT menfess_id, count(*) AS reports, min(created_at), max(created_at) FROM report '
+                     'GROUP BY menfess_id ORDER BY reports DESC, menfess_id DESC LIMIT 11',
+}
+
+
+def seed(path, args):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+
+    conn.executemany('INSERT INTO user (id, username, email, password, role) VALUES (?, ?, ?, ?, ?)',
+                     [(i, f'user{i}', f'user{i}@example.com', 'x', 'user') for i in range(1, args.users + 1)])
+    conn.executemany('INSERT INTO category (id, name) VALUES (?, ?)',
+                     [(i, f'Category {i}') for i in range(1, 6)])
+    conn.executemany(
+        'INSERT INTO menfess (id, content, is_approved, created_at, user_id, category_id) VALUES (?, ?, ?, ?, ?, ?)',
+        [(i, f'menfess {i}', rng.random() < 0.9, start + timedelta(seconds=i * 30),
+          rng.randint(1, args.users), rng.randint(1, 5)) for i in range(1, args.menfesses + 1)])
+    conn.executemany(
+        'INSERT INTO comment (content, created_at, user_id, menfess_id) VALUES (?, ?, ?, ?)',
+        [('comment', start + timedelta(seconds=i * 10), rng.randint(1, args.users),
+          rng.randint(1, args.menfesses)) for i in range(args.menfesses * 2)])
+    conn.executemany(
+        'INSERT OR IGNORE INTO "like" (menfess_id, user_id, created_at) VALUES (?, ?, ?)',
+        [(rng.randint(1, args.menfesses), rng.randint(1, args.users), start)
+         for _ in range(args.menfesses * 3)])
+    conn.executemany(
+        'INSERT INTO report (reason, created_at, menfess_id, reporter_id) VALUES (?, ?, ?, ?)',
+        [('spam', start + timedelta(seconds=i * 60), rng.randint(1, args.menfesses),
+          rng.randint(1, args.users)) for i in range(args.menfesses // 10)])
+    conn.commit()
+    return conn
+
+
+def run(conn, label, repeat):
+    print(f'\n== {label} ==')
+    for name, sql in QUERIES.items():
+        plan = '; '.join(row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql))
+        started = time.perf_counter()
+        for _ in range(repeat):
+            conn.execute(sql).fetchall()
+        elapsed = (time.perf_counter() - started) / repeat * 1000
+        print(f'{name:22} {elapsed:9.3f} ms  {plan}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--menfesses', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        print(f'Seeding {args.menfesses} menfesses...')
+        conn = seed(path, args)
+        indexes = [(index.name, index) for table in db.metadata.sorted_tables for index in table.indexes]
+
+        for name, _ in indexes:
+            conn.execute(f'DROP INDEX IF EXISTS {name}')
+        conn.execute('ANALYZE')
+        run(conn, 'without secondary indexes', args.repeat)
+
+        engine = create_engine(f'sqlite:///{path}')
+        with engine.begin() as connection:
+            for _, index in indexes:
+                index.create(connection)
+        engine.dispose()
+        conn.execute('ANALYZE')
+        run(conn, 'with model indexes', args.repeat)
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Compare FTS5 search against a LIKE '%q%' scan on a seeded database.
+
+Seeds a throwaway SQLite database with the app's schema (including the search
+indexes and their triggers), then times the page query behind /search for a few
+terms against the equivalent LIKE scan over menfess text, display names and
+comments, and the whole /search request (query, pagination and template).
+
+    python benchmarks/search.py --menfesses 200000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from search import MATCH_SQL, match_expression  # noqa: E402
+
+LIKE_SQL = """
+    SELECT id FROM menfess
+    WHERE is_approved = 1 AND (content LIKE :pattern OR display_name LIKE :pattern
+        OR id IN (SELECT menfess_id FROM comment WHERE content LIKE :pattern))
+    ORDER BY created_at DESC, id DESC LIMIT 10
+"""
+
+FTS_SQL = f"""
+    SELECT menfess.id FROM menfess JOIN ({MATCH_SQL}) AS matches ON menfess.id = matches.id
+    WHERE menfess.is_approved = 1
+    ORDER BY matches.rank, menfess.id DESC LIMIT 10
+"""
+
+SYLLABLES = ['ka', 'ki', 'ku', 'ma', 'mi', 'na', 'ni', 'sa', 'si', 'ta', 'te', 'ra', 'ri', 'la', 'ba', 'da']
+
+
+def make_vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def sentence(rng, vocabulary, weights, length):
+    return ' '.join(rng.choices(vocabulary, weights=weights, k=length))
+
+
+def seed(path, args):
+    engine = create_engine(f'sqlite:///{path}')
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    vocabulary = make_vocabulary(rng, args.vocabulary)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]  # Zipf-like word frequencies
+
+    conn.executemany('INSERT INTO user (id, username, email, password, role) VALUES (?, ?, ?, ?, ?)',
+                     [(i, f'user{i}', f'user{i}@example.com', 'x', 'user') for i in range(1, args.users + 1)])
+    conn.executemany(
+        'INSERT INTO menfess (id, content, display_name, is_approved, created_at, user_id) VALUES (?, ?, ?, ?, ?, ?)',
+        [(i, sentence(rng, vocabulary, weights, rng.randint(10, 60)),
+          rng.choice(vocabulary) if rng.random() < 0.3 else None, rng.random() < 0.9,
+          start + timedelta(seconds=i * 30), rng.randint(1, args.users)) for i in range(1, args.menfesses + 1)])
+    conn.executemany(
+        'INSERT INTO comment (content, created_at, user_id, menfess_id) VALUES (?, ?, ?, ?)',
+        [(sentence(rng, vocabulary, weights, rng.randint(3, 20)), start + timedelta(seconds=i * 10),
+          rng.randint(1, args.users), rng.randint(1, args.menfesses)) for i in range(args.menfesses * 2)])
+    conn.commit()
+    conn.execute('ANALYZE')
+    return conn, vocabulary
+
+
+def timed(conn, sql, params, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        rows = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - started) / repeat * 1000, len(rows)
+
+
+def timed_route(client, url, repeat):
+    client.get(url)  # Warm up templates and caches
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--menfesses', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        print(f'Seeding {args.menfesses} menfesses and {args.menfesses * 2} comments...')
+        conn, vocabulary = seed(path, args)
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'SECRET_KEY': 'search-benchmark',
+            'RATE_LIMIT_ENABLED': False,
+            'JOB_WORKERS': 0,
+            'MEDIA_STAGING_FOLDER': os.path.join(tmp, 'staging'),
+        })
+        client = app.test_client()
+        params = {'comment_weight': app.config['SEARCH_COMMENT_WEIGHT'],
+                  'candidates': app.config['SEARCH_MAX_CANDIDATES']}
+
+        terms = {
+            'common word': vocabulary[0],
+            'rare word': vocabulary[-1],
+            'two words': f'{vocabulary[1]} {vocabulary[50]}',
+            'prefix': vocabulary[10][:3],
+        }
+        print(f'\n{"query":14} {"LIKE scan":>12} {"FTS5 bm25":>12} {"/search":>12}')
+        for name, term in terms.items():
+            like_ms, _ = timed(conn, LIKE_SQL, {'pattern': f'%{term}%'}, args.repeat)
+            expression = match_expression(term, min_prefix=app.config['SEARCH_MIN_PREFIX'])
+            fts_ms, _ = timed(conn, FTS_SQL, dict(params, query=expression), args.repeat)
+            route_ms = timed_route(client, '/search?' + urlencode({'q': term}), args.repeat)
+            print(f'{name:14} {like_ms:9.3f} ms {fts_ms:9.3f} ms {route_ms:9.3f} ms')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+
+def format_event(event_id, event, data):
+    # One Server-Sent Events message
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class EventBroker:
+    # In-process publish/subscribe for the live stream. Every subscriber gets a
+    # bounded queue; publishing never blocks, and a subscriber that falls too far
+    # behind is dropped (its browser reconnects and replays what it missed).
+    def __init__(self, queue_size=100, replay_size=100):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def publish(self, event, data):
+        with self._lock:
+            event_id = next(self._ids)
+            message = format_event(event_id, event, data)
+            self._recent.append((event_id, message))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self.unsubscribe(subscriber)
+
+    def subscribe(self, last_event_id=None):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            # Replay the events a reconnecting client missed, if still buffered
+            if last_event_id is not None:
+                missed = [message for event_id, message in self._recent if event_id > last_event_id]
+                for message in missed[-self.queue_size:]:
+                    subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def is_subscribed(self, subscriber):
+        return subscriber in self._subscribers
+
+    def stream(self, subscriber, heartbeat=15, retry=5000):
+        # Generator for a text/event-stream response. A comment line is sent when
+        # nothing happened for `heartbeat` seconds so proxies keep the connection open.
+        try:
+            yield f"retry: {retry}\n\n"
+            while self.is_subscribed(subscriber):
+                try:
+                    yield subscriber.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+    def __len__(self):
+        return len(self._subscribers)
@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+
+
+def retry_delay(attempts, base=30, limit=3600):
+    # Exponential backoff: base seconds after the first failure, doubling up to limit
+    return min(base * 2 ** (attempts - 1), limit)
+
+
+class TaskRegistry:
+    # Job name -> function called with the job's keyword arguments
+    def __init__(self):
+        self._tasks = {}
+
+    def task(self, name):
+        def register(func):
+            self._tasks[name] = func
+            return func
+        return register
+
+    def get(self, name):
+        return self._tasks.get(name)
+
+    def __contains__(self, name):
+        return name in self._tasks
+
+    def __iter__(self):
+        return iter(sorted(self._tasks))
+
+
+class JobRunner:
+    # Worker threads for the job table. Each thread claims one due job at a time
+    # through `claim()` (atomic in the database, so several processes can share the
+    # table) and hands it to `execute(job)`; when nothing is due it sleeps for
+    # `poll_interval` seconds or until `notify()` is called. `tick()` runs in the
+    # first thread between jobs, at most every `tick_interval` seconds.
+    def __init__(self, claim, execute, tick=None, workers=2, poll_interval=1.0, tick_interval=60, logger=None):
+        self.claim = claim
+        self.execute = execute
+        self.tick = tick
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.tick_interval = tick_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._ticked = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads or not self.workers:
+                return
+            self._stop.clear()
+            self._threads = [threading.Thread(target=self._run, args=(index,), name=f'job-worker-{index}', daemon=True)
+                             for index in range(self.workers)]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        # Wake the idle workers, e.g. after committing a new job
+        self._wake.set()
+
+    @property
+    def running(self):
+        return bool(self._threads)
+
+    def run_pending(self):
+        # Run due jobs in the calling thread until none is left; returns how many ran
+        count = 0
+        while self._step(0):
+            count += 1
+        return count
+
+    def _step(self, index):
+        if index == 0 and self.tick and time.monotonic() - self._ticked >= self.tick_interval:
+            self._ticked = time.monotonic()
+            self.tick()
+        job = self.claim()
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def _run(self, index):
+        while not self._stop.is_set():
+            try:
+                if self._step(index):
+                    continue
+            except Exception:
+                # Keep the worker alive; a failing claim or tick (e.g. a locked
+                # database) is tried again after the poll interval
+                self.logger.exception('Job worker %s failed', index)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
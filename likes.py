@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import defaultdict
+
+
+class LikeBuffer:
+    # Write-behind buffer for like toggles in this process. A toggle only records the
+    # wanted state per (menfess_id, user_id); repeated toggles coalesce, and a toggle
+    # back to the stored state cancels out. A background thread hands the pending
+    # states to `flush` in batches. Until they are stored, `delta` and `liked` let
+    # reads merge them with what the database returns.
+    def __init__(self, flush, interval=0.25):
+        self.flush = flush
+        self.interval = interval
+        self._pending = {}  # (menfess_id, user_id) -> [stored, wanted]
+        self._inflight = {}  # Batch currently being written by `flush`
+        self._deltas = defaultdict(int)  # menfess_id -> like count change not yet stored
+        self._inflight_deltas = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def toggle(self, menfess_id, user_id, load_stored):
+        # Flip the like and return the new state. `load_stored` reads the stored state
+        # from the database and is only called for pairs the buffer doesn't know yet.
+        key = (menfess_id, user_id)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None and key in self._inflight:
+                entry = [self._inflight[key], self._inflight[key]]
+        if entry is None:
+            stored = load_stored()
+            entry = [stored, stored]
+
+        with self._lock:
+            entry = self._pending.get(key, entry)
+            entry[1] = not entry[1]
+            self._deltas[menfess_id] += 1 if entry[1] else -1
+            if entry[1] == entry[0]:
+                self._pending.pop(key, None)  # Back to the stored state, nothing to write
+            else:
+                self._pending[key] = entry
+        self._start()
+        return entry[1]
+
+    def liked(self, menfess_id, user_id, default):
+        key = (menfess_id, user_id)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key][1]
+            return self._inflight.get(key, default)
+
+    def delta(self, menfess_id):
+        if not self._deltas and not self._inflight_deltas:
+            return 0
+        with self._lock:
+            return self._deltas.get(menfess_id, 0) + self._inflight_deltas.get(menfess_id, 0)
+
+    def flush_now(self):
+        # Write everything pending through `flush(likes, unlikes)`; also used at exit
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    self._deltas.clear()  # Only toggles that cancelled out
+                    return 0
+                self._inflight = {key: entry[1] for key, entry in self._pending.items()}
+                self._inflight_deltas = dict(self._deltas)
+                self._pending = {}
+                self._deltas = defaultdict(int)
+            try:
+                self.flush([key for key, liked in self._inflight.items() if liked],
+                           [key for key, liked in self._inflight.items() if not liked])
+            except Exception:
+                # Put the batch back (newer toggles win) so it is retried on the next flush
+                with self._lock:
+                    for key, liked in self._inflight.items():
+                        self._pending.setdefault(key, [not liked, liked])
+                    for menfess_id, delta in self._inflight_deltas.items():
+                        self._deltas[menfess_id] += delta
+                    self._inflight, self._inflight_deltas = {}, {}
+                raise
+            with self._lock:
+                count = len(self._inflight)
+                self._inflight, self._inflight_deltas = {}, {}
+            return count
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='like-flush', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush_now()
+            except Exception:
+                pass  # Logged by `flush`; the batch stays pending and is retried
@@ -0,0 +1,35 @@
+import re
+
+from markupsafe import Markup, escape
+
+# All menfess commands in one pattern so content is scanned once:
+#   #bold#text#bold#  #italic#text#italic#  #quote#text#quote#  #color:red#text#color#
+TOKEN_RE = re.compile(
+    r'#(?:bold#(.*?)#bold'
+    r'|italic#(.*?)#italic'
+    r'|quote#(.*?)#quote'
+    r'|color:([a-zA-Z]+|#[0-9a-fA-F]{3,8})#(.*?)#color)#'
+)
+
+
+def _replace(match):
+    bold, italic, quote, color, colored = match.groups()
+    if bold is not None:
+        return f'<strong>{_render(bold)}</strong>'
+    if italic is not None:
+        return f'<em>{_render(italic)}</em>'
+    if quote is not None:
+        return f'<blockquote>{_render(quote)}</blockquote>'
+    return f'<span style="color:{color}">{_render(colored)}</span>'
+
+
+def _render(text):
+    # Nested commands are rendered inside each matched span
+    if '#' not in text:
+        return text
+    return TOKEN_RE.sub(_replace, text)
+
+
+def render_commands(text):
+    # Escape the raw text first so only the generated tags reach the page as HTML
+    return Markup(_render(str(escape(text))))
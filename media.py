@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import subprocess
+import uuid
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it avatars are stored as uploaded
+    Image = None
+
+# ffmpeg arguments per voice note container, keeping the original extension
+VOICE_CODECS = {
+    'webm': ['-c:a', 'libopus', '-b:a', '{bitrate}'],
+    'ogg': ['-c:a', 'libopus', '-b:a', '{bitrate}'],
+    'mp3': ['-c:a', 'libmp3lame', '-b:a', '{bitrate}'],
+    'wav': ['-c:a', 'pcm_s16le', '-ar', '16000'],
+}
+
+
+def thumbnail_filename(filename, size):
+    stem, ext = os.path.splitext(filename)
+    # GIF thumbnails are stored as a still PNG of the first frame
+    if ext.lower() == '.gif':
+        ext = '.png'
+    return f"{stem}_{size}{ext}"
+
+
+def temp_path(dest):
+    # A private name next to `dest` (same filesystem, same extension for Pillow)
+    stem, ext = os.path.splitext(dest)
+    return f"{stem}.{uuid.uuid4().hex}.tmp{ext}"
+
+
+def publish(source, dest):
+    # Published files are cached as immutable, so they must never be seen half
+    # written: copy (across filesystems) to a temporary name, then rename into place
+    temp = temp_path(dest)
+    try:
+        shutil.move(source, temp)
+        os.replace(temp, dest)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def save_image(image, dest, **options):
+    temp = temp_path(dest)
+    try:
+        image.save(temp, **options)
+        os.replace(temp, dest)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def process_avatar(source, dest_folder, filename, sizes, max_size):
+    # Move an uploaded picture into place, downscaling it to max_size and writing
+    # square thumbnails for each size. Returns metadata for the media record.
+    dest = os.path.join(dest_folder, filename)
+    metadata = {'width': None, 'height': None}
+
+    if Image is None:
+        publish(source, dest)
+        metadata['size'] = os.path.getsize(dest)
+        return metadata
+
+    with Image.open(source) as image:
+        metadata['width'], metadata['height'] = image.size
+        animated = getattr(image, 'is_animated', False)
+        still = ImageOps.exif_transpose(image)
+        if still.mode not in ('RGB', 'RGBA'):
+            has_alpha = still.mode in ('LA', 'PA') or 'transparency' in still.info
+            still = still.convert('RGBA' if has_alpha else 'RGB')
+
+        for size in sizes:
+            thumb = ImageOps.fit(still, (size, size), Image.LANCZOS)
+            thumb_path = os.path.join(dest_folder, thumbnail_filename(filename, size))
+            if thumb_path.lower().endswith(('.jpg', '.jpeg')):
+                save_image(thumb.convert('RGB'), thumb_path, quality=85, optimize=True)
+            else:
+                save_image(thumb, thumb_path, optimize=True)
+
+        if animated or max(image.size) <= max_size:
+            publish(source, dest)
+        else:
+            still.thumbnail((max_size, max_size), Image.LANCZOS)
+            if dest.lower().endswith(('.jpg', '.jpeg')):
+                save_image(still.convert('RGB'), dest, quality=85, optimize=True)
+            else:
+                save_image(still, dest, optimize=True)
+            metadata['width'], metadata['height'] = still.size
+            os.remove(source)
+
+    metadata['size'] = os.path.getsize(dest)
+    return metadata
+
+
+def probe_duration(path):
+    if not shutil.which('ffprobe'):
+        return None
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', path],
+        capture_output=True, text=True, timeout=60)
+    try:
+        return float(json.loads(result.stdout)['format']['duration'])
+    except (KeyError, ValueError):
+        return None
+
+
+def process_voice_note(source, dest_folder, filename, bitrate):
+    # Move an uploaded voice note into place, loudness-normalizing and re-encoding it
+    # as mono speech when ffmpeg is available and that makes the file smaller
+    dest = os.path.join(dest_folder, filename)
+    ext = filename.rsplit('.', 1)[-1].lower()
+
+    if shutil.which('ffmpeg') and ext in VOICE_CODECS:
+        encoded = f"{source}.encoded.{ext}"
+        codec = [arg.format(bitrate=bitrate) for arg in VOICE_CODECS[ext]]
+        result = subprocess.run(
+            ['ffmpeg', '-y', '-v', 'error', '-i', source, '-vn', '-ac', '1', '-af', 'loudnorm', *codec, encoded],
+            capture_output=True, timeout=300)
+        if result.returncode == 0 and os.path.getsize(encoded) < os.path.getsize(source):
+            os.replace(encoded, source)
+        elif os.path.exists(encoded):
+            os.remove(encoded)
+
+    publish(source, dest)
+    return {'size': os.path.getsize(dest), 'duration': probe_duration(dest)}
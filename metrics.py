@@ -0,0 +1,156 @@
+import threading
+from collections import defaultdict
+
+# Histogram bucket upper bounds (seconds for durations, count for queries)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation, capped at the maximum
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointStats:
+    def __init__(self):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statuses = defaultdict(int)
+
+
+class RequestStats:
+    # What one request spent, filled in by the engine and template hooks
+    def __init__(self, started, record_statements=False):
+        self.started = started
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = [] if record_statements else None
+
+    def add_query(self, statement, elapsed):
+        self.queries += 1
+        self.sql_time += elapsed
+        if self.statements is not None:
+            self.statements.append(statement)
+
+    def most_repeated(self):
+        # (statement, times) for the statement run most often, the usual N+1 signature
+        if not self.statements:
+            return None, 0
+        counts = defaultdict(int)
+        for statement in self.statements:
+            counts[statement] += 1
+        statement = max(counts, key=counts.get)
+        return statement, counts[statement]
+
+
+class Metrics:
+    # Per-process request metrics keyed by endpoint
+    def __init__(self):
+        self._endpoints = defaultdict(EndpointStats)
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, status, duration, stats):
+        with self._lock:
+            endpoint_stats = self._endpoints[endpoint]
+            endpoint_stats.duration.observe(duration)
+            endpoint_stats.queries.observe(stats.queries)
+            endpoint_stats.sql_time += stats.sql_time
+            endpoint_stats.template_time += stats.template_time
+            endpoint_stats.statuses[status] += 1
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def summary(self):
+        # One row per endpoint for the admin page, slowest p95 first
+        rows = []
+        with self._lock:
+            for endpoint, stats in self._endpoints.items():
+                count = stats.duration.count
+                rows.append({
+                    'endpoint': endpoint,
+                    'requests': count,
+                    'errors': sum(n for status, n in stats.statuses.items() if status >= 500),
+                    'avg_ms': stats.duration.sum / count * 1000,
+                    'p50_ms': stats.duration.quantile(0.5) * 1000,
+                    'p95_ms': stats.duration.quantile(0.95) * 1000,
+                    'p99_ms': stats.duration.quantile(0.99) * 1000,
+                    'max_ms': stats.duration.max * 1000,
+                    'avg_queries': stats.queries.sum / count,
+                    'max_queries': stats.queries.max,
+                    'avg_sql_ms': stats.sql_time / count * 1000,
+                    'avg_template_ms': stats.template_time / count * 1000,
+                })
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+    def prometheus(self, prefix='menfess'):
+        # Prometheus text exposition format (version 0.0.4)
+        lines = [
+            f'# HELP {prefix}_request_duration_seconds Request latency by endpoint.',
+            f'# TYPE {prefix}_request_duration_seconds histogram',
+        ]
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            for endpoint, stats in endpoints:
+                lines += _histogram_lines(f'{prefix}_request_duration_seconds', endpoint, stats.duration)
+            lines += [f'# HELP {prefix}_request_sql_queries SQL queries per request by endpoint.',
+                      f'# TYPE {prefix}_request_sql_queries histogram']
+            for endpoint, stats in endpoints:
+                lines += _histogram_lines(f'{prefix}_request_sql_queries', endpoint, stats.queries)
+            lines += [f'# HELP {prefix}_sql_seconds_total Time spent in SQL by endpoint.',
+                      f'# TYPE {prefix}_sql_seconds_total counter']
+            lines += [f'{prefix}_sql_seconds_total{{endpoint="{endpoint}"}} {stats.sql_time:.6f}'
+                      for endpoint, stats in endpoints]
+            lines += [f'# HELP {prefix}_template_seconds_total Time spent rendering templates by endpoint.',
+                      f'# TYPE {prefix}_template_seconds_total counter']
+            lines += [f'{prefix}_template_seconds_total{{endpoint="{endpoint}"}} {stats.template_time:.6f}'
+                      for endpoint, stats in endpoints]
+            lines += [f'# HELP {prefix}_responses_total Responses by endpoint and status code.',
+                      f'# TYPE {prefix}_responses_total counter']
+            for endpoint, stats in endpoints:
+                lines += [f'{prefix}_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}'
+                          for status, count in sorted(stats.statuses.items())]
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, endpoint, histogram):
+    lines = [f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {total}'
+             for bound, total in histogram.cumulative()]
+    lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.sum:.6f}')
+    lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+    return lines
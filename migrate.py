@@ -1,13 +1,11 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from app import app, db, User, Menfess, Category, Report, Like, Comment
+from app import create_app
 
-# Initialize Flask-Migrate
-migrate = Migrate(app, db)
+# Flask-Migrate is set up by create_app(); this module remains as a CLI entry point
+app = create_app()
 
 if __name__ == '__main__':
-    print("Run the following commands to update your database:")
-    print("flask db init")
-    print("flask db migrate -m 'Add profile pictures and comments'")
-    print("flask db upgrade")
+    print("Run the following command to update your database:")
+    print("flask --app migrate db upgrade")
+    print()
+    print("To create a new migration after changing the models:")
+    print("flask --app migrate db migrate -m 'Describe the change'")
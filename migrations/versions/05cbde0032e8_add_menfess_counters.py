@@ -0,0 +1,36 @@
+"""Add like/comment/report counters to menfess
+
+Revision ID: 05cbde0032e8
+Revises: f06ad4ffaf34
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '05cbde0032e8'
+down_revision = 'f06ad4ffaf34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('menfess', sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('menfess', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('menfess', sa.Column('report_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute('''
+        UPDATE menfess SET
+            like_count = (SELECT count(*) FROM "like" WHERE "like".menfess_id = menfess.id),
+            comment_count = (SELECT count(*) FROM comment WHERE comment.menfess_id = menfess.id),
+            report_count = (SELECT count(*) FROM report WHERE report.menfess_id = menfess.id)
+    ''')
+
+
+def downgrade():
+    with op.batch_alter_table('menfess') as batch_op:
+        batch_op.drop_column('report_count')
+        batch_op.drop_column('comment_count')
+        batch_op.drop_column('like_count')
@@ -0,0 +1,41 @@
+"""Add dashboard statistics tables and menfess approval time
+
+Revision ID: 138c6468a580
+Revises: 1cb2019a9969
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '138c6468a580'
+down_revision = '1cb2019a9969'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stat_counter',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('stat_rollup',
+        sa.Column('metric', sa.String(length=50), nullable=False),
+        sa.Column('period', sa.String(length=10), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('total', sa.Float(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('metric', 'period', 'bucket')
+    )
+    # A plain ALTER TABLE (not batch mode) keeps the search triggers on menfess
+    op.add_column('menfess', sa.Column('approved_at', sa.DateTime(), nullable=True))
+    # The counters and rollups are filled by `flask init-db` (rebuild-stats)
+
+
+def downgrade():
+    op.drop_column('menfess', 'approved_at')  # Needs SQLite 3.35+; batch mode would drop the search triggers
+    op.drop_table('stat_rollup')
+    op.drop_table('stat_counter')
@@ -0,0 +1,118 @@
+"""Baseline schema
+
+Creates the original tables on an empty database and brings databases created
+by older releases (or patched by the old update_db scripts) up to the same
+shape, so every install can be upgraded from here.
+
+Revision ID: 1a7435caab53
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1a7435caab53'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if 'user' not in tables:
+        op.create_table('user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=80), nullable=False),
+            sa.Column('email', sa.String(length=120), nullable=False),
+            sa.Column('password', sa.String(length=200), nullable=False),
+            sa.Column('role', sa.String(length=20), nullable=True),
+            sa.Column('is_suspended', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('theme_preference', sa.String(length=10), nullable=True),
+            sa.Column('profile_picture', sa.String(length=200), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('username')
+        )
+    elif 'profile_picture' not in [c['name'] for c in inspector.get_columns('user')]:
+        op.add_column('user', sa.Column('profile_picture', sa.String(length=200), server_default='default.png', nullable=True))
+
+    if 'category' not in tables:
+        op.create_table('category',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.Column('description', sa.String(length=200), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+
+    if 'menfess' not in tables:
+        op.create_table('menfess',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('is_approved', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('category_id', sa.Integer(), nullable=True),
+            sa.Column('voice_note', sa.String(length=200), nullable=True),
+            sa.Column('display_name', sa.String(length=100), nullable=True),
+            sa.ForeignKeyConstraint(['category_id'], ['category.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+    else:
+        columns = [c['name'] for c in inspector.get_columns('menfess')]
+        if 'voice_note' not in columns:
+            op.add_column('menfess', sa.Column('voice_note', sa.String(length=200), nullable=True))
+        if 'display_name' not in columns:
+            op.add_column('menfess', sa.Column('display_name', sa.String(length=100), nullable=True))
+
+    if 'comment' not in tables:
+        op.create_table('comment',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('menfess_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['menfess_id'], ['menfess.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'report' not in tables:
+        op.create_table('report',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('reason', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('menfess_id', sa.Integer(), nullable=False),
+            sa.Column('reporter_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['menfess_id'], ['menfess.id'], ),
+            sa.ForeignKeyConstraint(['reporter_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'like' not in tables:
+        op.create_table('like',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('menfess_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['menfess_id'], ['menfess.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('menfess_id', 'user_id', name='unique_like')
+        )
+
+
+def downgrade():
+    op.drop_table('like')
+    op.drop_table('report')
+    op.drop_table('comment')
+    op.drop_table('menfess')
+    op.drop_table('category')
+    op.drop_table('user')
@@ -0,0 +1,28 @@
+"""Add version stamps for the in-process category registry
+
+Revision ID: 1cb2019a9969
+Revises: dc3bd4b3499e
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1cb2019a9969'
+down_revision = 'dc3bd4b3499e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('version_stamp',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('version_stamp')
@@ -0,0 +1,41 @@
+"""Add prefix indexes to the FTS5 search tables
+
+Revision ID: 5dce12388b5d
+Revises: a5163f126aea
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5dce12388b5d'
+down_revision = 'a5163f126aea'
+branch_labels = None
+depends_on = None
+
+# The triggers refer to the tables by name, so they keep working once the tables
+# are recreated
+TABLES = {
+    'menfess_fts': """CREATE VIRTUAL TABLE menfess_fts USING fts5(
+        content, display_name, content='menfess', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'{prefix})""",
+    'comment_fts': """CREATE VIRTUAL TABLE comment_fts USING fts5(
+        content, content='comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'{prefix})""",
+}
+
+
+def recreate(prefix):
+    for name, statement in TABLES.items():
+        op.execute(f'DROP TABLE IF EXISTS {name}')
+        op.execute(statement.format(prefix=prefix))
+        op.execute(f"INSERT INTO {name} ({name}) VALUES ('rebuild')")
+
+
+def upgrade():
+    recreate(", prefix='3 4'")
+
+
+def downgrade():
+    recreate('')
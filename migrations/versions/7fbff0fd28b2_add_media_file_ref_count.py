@@ -0,0 +1,32 @@
+"""Add reference counts to media_file for the content-addressed upload store
+
+Revision ID: 7fbff0fd28b2
+Revises: b1510feef47c
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7fbff0fd28b2'
+down_revision = 'b1510feef47c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('media_file', sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute('''
+        UPDATE media_file SET ref_count = CASE kind
+            WHEN 'avatar' THEN (SELECT count(*) FROM user WHERE user.profile_picture = media_file.filename)
+            ELSE (SELECT count(*) FROM menfess WHERE menfess.voice_note = media_file.filename)
+        END
+    ''')
+
+
+def downgrade():
+    with op.batch_alter_table('media_file') as batch_op:
+        batch_op.drop_column('ref_count')
@@ -0,0 +1,64 @@
+"""Add FTS5 search indexes over menfesses and comments
+
+Revision ID: 7ff2947c861a
+Revises: 7fbff0fd28b2
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7ff2947c861a'
+down_revision = '7fbff0fd28b2'
+branch_labels = None
+depends_on = None
+
+TABLES = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS menfess_fts USING fts5(
+        content, display_name, content='menfess', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(
+        content, content='comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+]
+
+TRIGGERS = {
+    'menfess_fts_insert': """CREATE TRIGGER IF NOT EXISTS menfess_fts_insert AFTER INSERT ON menfess BEGIN
+        INSERT INTO menfess_fts (rowid, content, display_name) VALUES (new.id, new.content, new.display_name);
+    END""",
+    'menfess_fts_delete': """CREATE TRIGGER IF NOT EXISTS menfess_fts_delete AFTER DELETE ON menfess BEGIN
+        INSERT INTO menfess_fts (menfess_fts, rowid, content, display_name)
+        VALUES ('delete', old.id, old.content, old.display_name);
+    END""",
+    'menfess_fts_update': """CREATE TRIGGER IF NOT EXISTS menfess_fts_update AFTER UPDATE OF content, display_name ON menfess BEGIN
+        INSERT INTO menfess_fts (menfess_fts, rowid, content, display_name)
+        VALUES ('delete', old.id, old.content, old.display_name);
+        INSERT INTO menfess_fts (rowid, content, display_name) VALUES (new.id, new.content, new.display_name);
+    END""",
+    'comment_fts_insert': """CREATE TRIGGER IF NOT EXISTS comment_fts_insert AFTER INSERT ON comment BEGIN
+        INSERT INTO comment_fts (rowid, content) VALUES (new.id, new.content);
+    END""",
+    'comment_fts_delete': """CREATE TRIGGER IF NOT EXISTS comment_fts_delete AFTER DELETE ON comment BEGIN
+        INSERT INTO comment_fts (comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    'comment_fts_update': """CREATE TRIGGER IF NOT EXISTS comment_fts_update AFTER UPDATE OF content ON comment BEGIN
+        INSERT INTO comment_fts (comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO comment_fts (rowid, content) VALUES (new.id, new.content);
+    END""",
+}
+
+
+def upgrade():
+    for statement in TABLES + list(TRIGGERS.values()):
+        op.execute(statement)
+    # Index the rows that already exist
+    op.execute("INSERT INTO menfess_fts (menfess_fts) VALUES ('rebuild')")
+    op.execute("INSERT INTO comment_fts (comment_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    for name in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    op.execute('DROP TABLE IF EXISTS comment_fts')
+    op.execute('DROP TABLE IF EXISTS menfess_fts')
@@ -0,0 +1,33 @@
+"""Add the trending score column and its feed indexes
+
+Revision ID: 8107b25c2fc2
+Revises: 7ff2947c861a
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8107b25c2fc2'
+down_revision = '7ff2947c861a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A plain ALTER TABLE (not batch mode) keeps the search triggers on menfess
+    op.add_column('menfess', sa.Column('hot_score', sa.Float(), server_default='0', nullable=False))
+
+    # hot_score() is registered on every connection by the app (see set_sqlite_pragmas)
+    op.execute('UPDATE menfess SET hot_score = hot_score(like_count, comment_count, created_at)')
+
+    op.create_index('ix_menfess_approved_hot', 'menfess', ['is_approved', 'hot_score'])
+    op.create_index('ix_menfess_approved_category_hot', 'menfess', ['is_approved', 'category_id', 'hot_score'])
+
+
+def downgrade():
+    op.drop_index('ix_menfess_approved_category_hot', table_name='menfess')
+    op.drop_index('ix_menfess_approved_hot', table_name='menfess')
+    op.drop_column('menfess', 'hot_score')  # Needs SQLite 3.35+; batch mode would drop the search triggers
@@ -0,0 +1,42 @@
+"""Add the background job queue
+
+Revision ID: a5163f126aea
+Revises: 138c6468a580
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5163f126aea'
+down_revision = '138c6468a580'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('args', sa.Text(), nullable=False),
+        sa.Column('key', sa.String(length=200), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_status_run_at', 'job', ['status', 'run_at'])
+    op.create_index('ix_job_key_status', 'job', ['key', 'status'])
+
+
+def downgrade():
+    op.drop_index('ix_job_key_status', table_name='job')
+    op.drop_index('ix_job_status_run_at', table_name='job')
+    op.drop_table('job')
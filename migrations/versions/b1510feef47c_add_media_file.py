@@ -0,0 +1,38 @@
+"""Add media_file table for processed upload metadata
+
+Revision ID: b1510feef47c
+Revises: 05cbde0032e8
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b1510feef47c'
+down_revision = '05cbde0032e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_file',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('filename', sa.String(length=200), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('size', sa.Integer(), nullable=True),
+        sa.Column('width', sa.Integer(), nullable=True),
+        sa.Column('height', sa.Integer(), nullable=True),
+        sa.Column('duration', sa.Float(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('kind', 'filename', name='unique_media_file')
+    )
+
+
+def downgrade():
+    op.drop_table('media_file')
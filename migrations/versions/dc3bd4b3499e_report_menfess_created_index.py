@@ -0,0 +1,26 @@
+"""Index reports by menfess and time for the grouped report view
+
+Revision ID: dc3bd4b3499e
+Revises: 8107b25c2fc2
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'dc3bd4b3499e'
+down_revision = '8107b25c2fc2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The wider index also serves every lookup the old one did
+    op.create_index('ix_report_menfess_created', 'report', ['menfess_id', 'created_at'])
+    op.drop_index('ix_report_menfess', table_name='report')
+
+
+def downgrade():
+    op.create_index('ix_report_menfess', 'report', ['menfess_id'])
+    op.drop_index('ix_report_menfess_created', table_name='report')
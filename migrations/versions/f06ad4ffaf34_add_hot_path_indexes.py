@@ -0,0 +1,39 @@
+"""Add indexes for the feed, comment and report queries
+
+Revision ID: f06ad4ffaf34
+Revises: 1a7435caab53
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f06ad4ffaf34'
+down_revision = '1a7435caab53'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_menfess_approved_created', 'menfess', ['is_approved', 'created_at']),
+    ('ix_menfess_approved_category_created', 'menfess', ['is_approved', 'category_id', 'created_at']),
+    ('ix_menfess_user_created', 'menfess', ['user_id', 'created_at']),
+    ('ix_comment_menfess_created', 'comment', ['menfess_id', 'created_at']),
+    ('ix_report_created', 'report', ['created_at']),
+    ('ix_report_menfess', 'report', ['menfess_id']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # db.create_all() may already have built them on a fresh database
+        if name not in [index['name'] for index in inspector.get_indexes(table)]:
+            op.create_index(name, table, columns)
+    op.execute('ANALYZE')
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
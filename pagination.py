@@ -0,0 +1,106 @@
+from datetime import datetime
+
+from flask import request, url_for
+from markupsafe import Markup, escape
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(created_at, row_id):
+    return f"{created_at.isoformat()}_{row_id}"
+
+
+def decode_cursor(cursor):
+    # Returns (created_at, id) or None if the cursor is missing or malformed
+    if not cursor:
+        return None
+    try:
+        created_at, row_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError:
+        return None
+
+
+def keyset_condition(created_at_column, id_column, cursor, newer):
+    # Rows after a decoded (created_at, id) cursor: newer ones, or older ones
+    created_at, row_id = cursor
+    if newer:
+        return or_(created_at_column > created_at, and_(created_at_column == created_at, id_column > row_id))
+    return or_(created_at_column < created_at, and_(created_at_column == created_at, id_column < row_id))
+
+
+class CursorPagination:
+    # Keyset pagination on (created_at, id), newest first.
+    # ?before=<cursor> pages to older rows, ?after=<cursor> pages to newer rows.
+    # Exposes `links` like flask_paginate.Pagination so templates can render either.
+    def __init__(self, query, model, per_page):
+        self.per_page = per_page
+        before = decode_cursor(request.args.get('before'))
+        after = decode_cursor(request.args.get('after'))
+
+        if after:
+            query = query.filter(keyset_condition(model.created_at, model.id, after, newer=True))
+            rows = query.order_by(model.created_at.asc(), model.id.asc()).limit(per_page + 1).all()
+            self.has_newer = len(rows) > per_page
+            self.has_older = True
+            self.items = list(reversed(rows[:per_page]))
+        else:
+            if before:
+                query = query.filter(keyset_condition(model.created_at, model.id, before, newer=False))
+            rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+            self.has_older = len(rows) > per_page
+            self.has_newer = before is not None
+            self.items = rows[:per_page]
+
+        self.newer_url = None
+        self.older_url = None
+        if self.items and self.has_newer:
+            first = self.items[0]
+            self.newer_url = self._url(after=encode_cursor(first.created_at, first.id))
+        if self.items and self.has_older:
+            last = self.items[-1]
+            self.older_url = self._url(before=encode_cursor(last.created_at, last.id))
+
+    def _url(self, **cursor):
+        args = request.args.to_dict()
+        args.pop('before', None)
+        args.pop('after', None)
+        args.pop('page', None)
+        args.update(cursor)
+        return url_for(request.endpoint, **request.view_args, **args)
+
+    @property
+    def links(self):
+        return pager_links(((self.newer_url, '&laquo; Newer'), (self.older_url, 'Older &raquo;')))
+
+
+class PagePagination:
+    # ?page=N pagination that fetches one row past the page to know whether there is
+    # a next one, instead of counting every match. Exposes `links` like the others.
+    def __init__(self, query, per_page):
+        self.per_page = per_page
+        self.page = max(request.args.get('page', 1, type=int), 1)
+        rows = [] if query is None else query.offset((self.page - 1) * per_page).limit(per_page + 1).all()
+        self.has_next = len(rows) > per_page
+        self.items = rows[:per_page]
+        self.prev_url = self._url(self.page - 1) if self.page > 1 else None
+        self.next_url = self._url(self.page + 1) if self.has_next else None
+
+    def _url(self, page):
+        args = request.args.to_dict()
+        args['page'] = page
+        return url_for(request.endpoint, **request.view_args, **args)
+
+    @property
+    def links(self):
+        return pager_links(((self.prev_url, '&laquo; Previous'), (self.next_url, 'Next &raquo;')))
+
+
+def pager_links(pairs):
+    # Bootstrap pager from (url or None, label) pairs; missing urls render disabled
+    items = []
+    for url, label in pairs:
+        if url:
+            items.append(f'<li class="page-item"><a class="page-link" href="{escape(url)}">{label}</a></li>')
+        else:
+            items.append(f'<li class="page-item disabled"><span class="page-link">{label}</span></li>')
+    return Markup(f'<nav aria-label="..."><ul class="pagination">{"".join(items)}</ul></nav>')
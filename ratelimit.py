@@ -0,0 +1,129 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+LIMIT_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*$')
+
+
+def parse_limit(limit):
+    # "5/minute" or "100/2 hours" -> (capacity, tokens refilled per second)
+    match = LIMIT_RE.match(limit)
+    if not match:
+        raise ValueError(f"Invalid rate limit: {limit!r}")
+    count, multiplier, period = match.groups()
+    seconds = PERIODS[period] * int(multiplier or 1)
+    return int(count), int(count) / seconds
+
+
+class MemoryBucketStore:
+    # Token buckets kept in this process (each worker limits on its own)
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now=None):
+        # Returns 0 if a token was taken, otherwise the seconds until one is available
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self._buckets.move_to_end(key)
+                while len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+                return 0
+            return (1 - tokens) / rate
+
+    def refund(self, key, capacity):
+        # Give back a token taken for a request that was rejected anyway
+        with self._lock:
+            if key in self._buckets:
+                tokens, updated = self._buckets[key]
+                self._buckets[key] = (min(capacity, tokens + 1), updated)
+
+
+class SQLiteBucketStore:
+    # Token buckets shared by every worker through a small SQLite file of their own,
+    # so throttling never writes to (or waits on) the main database
+    def __init__(self, path, busy_timeout=1000):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')  # Losing a few buckets in a crash is harmless
+            connection.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, capacity, rate, now=None):
+        # Refill and take a token in one atomic upsert; no row comes back when the
+        # bucket is empty, and the bucket is then left as it was
+        now = time.time() if now is None else now
+        params = {'key': key, 'capacity': capacity, 'rate': rate, 'now': now}
+        connection = self._connection()
+        taken = connection.execute('''
+            INSERT INTO bucket (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = min(:capacity, tokens + (:now - updated) * :rate) - 1,
+                updated = :now
+            WHERE min(:capacity, tokens + (:now - updated) * :rate) >= 1
+            RETURNING tokens
+        ''', params).fetchone()
+        if taken is not None:
+            return 0
+        row = connection.execute('SELECT min(:capacity, tokens + (:now - updated) * :rate) FROM bucket WHERE key = :key',
+                                 params).fetchone()
+        return (1 - row[0]) / rate if row else 0
+
+    def refund(self, key, capacity):
+        self._connection().execute('UPDATE bucket SET tokens = min(:capacity, tokens + 1) WHERE key = :key',
+                                   {'key': key, 'capacity': capacity})
+
+    def clear(self):
+        self._connection().execute('DELETE FROM bucket')
+
+
+def make_bucket_store(url):
+    # 'memory' limits per process; sqlite:///<path> shares the buckets between processes
+    if url and url.startswith('sqlite:///'):
+        return SQLiteBucketStore(url[len('sqlite:///'):])
+    return MemoryBucketStore()
+
+
+class RateLimiter:
+    def __init__(self, store=None):
+        self.store = store or MemoryBucketStore()
+
+    def hit(self, keys, limit):
+        # Take a token from each key's bucket for this limit; returns the whole number
+        # of seconds to wait if any of them is empty, else 0. A rejected request gives
+        # its tokens back, so e.g. a user over their own limit doesn't drain the
+        # per-IP budget shared with everyone behind the same NAT.
+        capacity, rate = parse_limit(limit)
+        retry_after = 0
+        taken = []
+        for key in keys:
+            wait = self.store.take(key, capacity, rate)
+            if wait:
+                retry_after = max(retry_after, wait)
+            else:
+                taken.append(key)
+        if retry_after:
+            for key in taken:
+                self.store.refund(key, capacity)
+        return math.ceil(retry_after)
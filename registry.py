@@ -0,0 +1,55 @@
+import threading
+import time
+from types import MappingProxyType
+
+
+class Snapshot:
+    # Immutable set of rows at one version, in load order and by id
+    def __init__(self, version, items):
+        self.version = version
+        self.items = tuple(items)
+        self.by_id = MappingProxyType({item.id: item for item in self.items})
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class VersionedRegistry:
+    # Rarely changing rows loaded once per process and shared as an immutable
+    # snapshot. Every write bumps a version stamp in the database; `load_version`
+    # reads it at most every `interval` seconds, so writes made by other workers
+    # show up within that time, and `invalidate` makes this worker reload at once.
+    def __init__(self, load, load_version, interval=5):
+        self.load = load
+        self.load_version = load_version
+        self.interval = interval
+        self._snapshot = None
+        self._checked = 0
+        self._lock = threading.Lock()
+
+    def current(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked < self.interval:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - self._checked < self.interval:
+                return snapshot  # Checked by another thread meanwhile
+            # The version is read before the rows: a write landing in between makes
+            # the next check reload again instead of keeping new rows under an old stamp
+            version = self.load_version()
+            if snapshot is None or snapshot.version != version:
+                snapshot = Snapshot(version, self.load())
+            self._snapshot = snapshot
+            self._checked = time.monotonic()
+            return snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
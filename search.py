@@ -0,0 +1,78 @@
+import re
+
+# FTS5 indexes over menfess text and comments. They are external-content tables:
+# the text lives only in menfess/comment and the triggers keep the index in step
+# with every insert, delete and text edit (counter updates don't touch it).
+# Prefix indexes on 3 and 4 characters keep short "word*" queries from merging
+# the posting lists of every term they expand to.
+SEARCH_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS menfess_fts USING fts5(
+        content, display_name, content='menfess', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='3 4')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(
+        content, content='comment', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='3 4')""",
+    """CREATE TRIGGER IF NOT EXISTS menfess_fts_insert AFTER INSERT ON menfess BEGIN
+        INSERT INTO menfess_fts (rowid, content, display_name) VALUES (new.id, new.content, new.display_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS menfess_fts_delete AFTER DELETE ON menfess BEGIN
+        INSERT INTO menfess_fts (menfess_fts, rowid, content, display_name)
+        VALUES ('delete', old.id, old.content, old.display_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS menfess_fts_update AFTER UPDATE OF content, display_name ON menfess BEGIN
+        INSERT INTO menfess_fts (menfess_fts, rowid, content, display_name)
+        VALUES ('delete', old.id, old.content, old.display_name);
+        INSERT INTO menfess_fts (rowid, content, display_name) VALUES (new.id, new.content, new.display_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_insert AFTER INSERT ON comment BEGIN
+        INSERT INTO comment_fts (rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_delete AFTER DELETE ON comment BEGIN
+        INSERT INTO comment_fts (comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS comment_fts_update AFTER UPDATE OF content ON comment BEGIN
+        INSERT INTO comment_fts (comment_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO comment_fts (rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+# Rebuild both indexes from their content tables
+REBUILD_SEARCH = [
+    "INSERT INTO menfess_fts (menfess_fts) VALUES ('rebuild')",
+    "INSERT INTO comment_fts (comment_fts) VALUES ('rebuild')",
+]
+
+# Best bm25 rank per menfess over its own text and its comments. bm25() is
+# negative (lower is better), so scaling comment hits by a weight below 1
+# ranks them after equally good matches in the menfess itself. Each index only
+# contributes its :candidates newest hits: walking the index backwards by rowid
+# stops after that many, while ORDER BY rank would score every match first, so
+# common terms cost the same as rare ones.
+MATCH_SQL = """
+    SELECT id, min(rank) AS rank FROM (
+        SELECT * FROM (
+            SELECT rowid AS id, rank FROM menfess_fts
+            WHERE menfess_fts MATCH :query ORDER BY rowid DESC LIMIT :candidates
+        )
+        UNION ALL
+        SELECT comment.menfess_id AS id, hits.rank * :comment_weight AS rank FROM (
+            SELECT rowid, rank FROM comment_fts
+            WHERE comment_fts MATCH :query ORDER BY rowid DESC LIMIT :candidates
+        ) AS hits JOIN comment ON comment.id = hits.rowid
+    ) GROUP BY id
+"""
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def match_expression(text, max_terms=8, min_prefix=3):
+    # Turn user input into a safe FTS5 query: every word is quoted (so operators and
+    # column filters are taken literally) and the last one matches as a prefix once
+    # it is min_prefix characters long (shorter prefixes expand to most of the index)
+    words = WORD_RE.findall(text or '')[:max_terms]
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if len(words[-1]) >= min_prefix:
+        terms[-1] += '*'
+    return ' '.join(terms)
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+# Rollup periods and how far back the dashboard shows each
+PERIODS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+
+def bucket_start(at, period):
+    if period == 'hour':
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def series(buckets, period, now, length):
+    # Values of the last `length` buckets up to `now`, oldest first; `buckets` maps
+    # bucket start -> value and missing buckets count as 0
+    last = bucket_start(now, period)
+    return [buckets.get(last - PERIODS[period] * offset, 0) for offset in range(length - 1, -1, -1)]
+
+
+def sparkline(values, width=120, height=28, padding=2):
+    # Points of an SVG polyline scaled to the box, highest value at the top
+    if not values:
+        return ''
+    top = max(values) or 1
+    step = (width - 2 * padding) / max(len(values) - 1, 1)
+    return ' '.join(f'{padding + index * step:.1f},{height - padding - (height - 2 * padding) * value / top:.1f}'
+                    for index, value in enumerate(values))
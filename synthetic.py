@@ -0,0 +1,108 @@
+import random
+from datetime import timedelta
+
+WORDS = (
+    'aku kamu dia kita mereka yang di ke dari dan atau tapi karena kalau sudah belum '
+    'kampus kelas dosen tugas kantin parkir perpustakaan organisasi ujian skripsi '
+    'suka kangen sedih senang bingung capek semangat malu takut berani jujur '
+    'hari ini kemarin besok pagi malam minggu depan tadi selalu kadang jarang '
+    'teman sahabat gebetan pacar mantan kakak adik tingkat angkatan jurusan '
+    'makasih maaf tolong semoga pengen mau bisa harus jangan cuma banget sekali'
+).split()
+
+COMMANDS = ('#bold#{}#bold#', '#italic#{}#italic#', '#color:red#{}#color#')
+
+REASONS = ('Spam', 'Harassment', 'Hate speech', 'Personal information', 'Inappropriate content')
+
+
+def sentence(rng, low, high):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+    if rng.random() < 0.1:
+        index = rng.randrange(len(words))
+        words[index] = rng.choice(COMMANDS).format(words[index])
+    return ' '.join(words).capitalize() + rng.choice('.!?')
+
+
+def pick(rng, first_id, count, skew=3):
+    # Ids near the end (the newest rows) are picked far more often, like real traffic
+    return first_id + count - 1 - int(count * rng.random() ** skew)
+
+
+class SyntheticData:
+    # Reproducible rows for load tests and benchmarks. Ids start after the rows
+    # already in the database so the data can be added to an existing one.
+    def __init__(self, seed=0, start=None, days=30):
+        self.rng = random.Random(seed)
+        self.start = start
+        self.span = timedelta(days=days).total_seconds()
+
+    def posted_at(self, menfess_id, menfesses):
+        first_id, count = menfesses
+        return self.start + timedelta(seconds=self.span * (menfess_id - first_id) / count)
+
+    def reacted_at(self, menfess_id, menfesses):
+        # Some time between the menfess being posted and the end of the span
+        posted = self.posted_at(menfess_id, menfesses)
+        remaining = (self.start + timedelta(seconds=self.span) - posted).total_seconds()
+        return posted + timedelta(seconds=remaining * self.rng.random())
+
+    def users(self, first_id, count, password_hash):
+        for user_id in range(first_id, first_id + count):
+            yield {'id': user_id, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+                   'password': password_hash, 'role': 'user', 'is_suspended': False,
+                   'created_at': self.start, 'theme_preference': 'light', 'profile_picture': 'default.png'}
+
+    def categories(self, first_id, count):
+        for category_id in range(first_id, first_id + count):
+            yield {'id': category_id, 'name': f'Category {category_id}', 'description': sentence(self.rng, 3, 8)}
+
+    def menfesses(self, first_id, count, users, categories, approved=0.9, display_names=0.3):
+        # `users` and `categories` are (first_id, count) ranges; rows are spread over
+        # the time span in id order, so newer menfesses have higher ids
+        for menfess_id in range(first_id, first_id + count):
+            user_id = self.rng.randrange(users[0], users[0] + users[1])
+            yield {'id': menfess_id, 'content': sentence(self.rng, 5, 60),
+                   'is_approved': self.rng.random() < approved,
+                   'created_at': self.posted_at(menfess_id, (first_id, count)),
+                   'user_id': user_id,
+                   'category_id': self.rng.randrange(categories[0], categories[0] + categories[1]),
+                   'voice_note': None,
+                   'display_name': f'user{user_id}' if self.rng.random() < display_names else None}
+
+    def comments(self, count, users, menfesses):
+        for _ in range(count):
+            menfess_id = pick(self.rng, *menfesses)
+            yield {'content': sentence(self.rng, 2, 25),
+                   'created_at': self.reacted_at(menfess_id, menfesses),
+                   'user_id': self.rng.randrange(users[0], users[0] + users[1]),
+                   'menfess_id': menfess_id}
+
+    def likes(self, count, users, menfesses):
+        # At most one like per (menfess, user); duplicates are drawn again
+        seen = set()
+        attempts = 0
+        while len(seen) < count and attempts < count * 10:
+            attempts += 1
+            key = (pick(self.rng, *menfesses), self.rng.randrange(users[0], users[0] + users[1]))
+            if key not in seen:
+                seen.add(key)
+                yield {'menfess_id': key[0], 'user_id': key[1], 'created_at': self.reacted_at(key[0], menfesses)}
+
+    def reports(self, count, users, menfesses):
+        for _ in range(count):
+            menfess_id = pick(self.rng, *menfesses, skew=2)
+            yield {'reason': self.rng.choice(REASONS),
+                   'created_at': self.reacted_at(menfess_id, menfesses),
+                   'menfess_id': menfess_id,
+                   'reporter_id': self.rng.randrange(users[0], users[0] + users[1])}
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,6 @@
+from app import create_app
+
+# WSGI entry point, e.g. `gunicorn -w 4 wsgi:app` (with MENFESS_LIVE_UPDATES=true,
+# `gunicorn -k gevent -w 1 wsgi:app` instead; see README).
+# Run `flask --app wsgi init-db` once before starting the workers.
+app = create_app()